@@ -0,0 +1,320 @@
+# Time Dots 性能基准：在 offscreen 平台上无界面运行，使用临时目录里合成的配置与数据分片，
+# 不会读写真实的 config.json / data。结果写成 JSON，可与之前保存的基线对比：
+#   python bench_timedot.py --out bench.json
+#   python bench_timedot.py --baseline bench.json --tolerance 0.25
+# 启动耗时在子进程中测量 (含解释器启动与 import)，首帧中位数超过 --startup-budget 时以非零状态退出
+import time
+PROBE_T0 = time.perf_counter()
+import os
+import sys
+import math
+import gc
+import json
+import subprocess
+import random
+import argparse
+import tempfile
+import platform
+import statistics
+from datetime import date, timedelta
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import timedot_nnlv as T
+from PyQt6.QtCore import QPoint, QT_VERSION_STR
+from PyQt6.QtGui import QImage, QCursor
+
+# segments / notes_every 针对 "今天"；历史日期只放少量数据，避免夹具本身过大
+SCENARIOS = {
+    'light': dict(segments=1, notes_every=0, interval=10, start="09:00", end="19:00", years=0),
+    'busy': dict(segments=50, notes_every=15, interval=10, start="09:00", end="19:00", years=1),
+    'dense': dict(segments=500, notes_every=5, interval=1, start="00:00", end="23:59", years=3),
+}
+HISTORY_SEGMENTS = 12
+HISTORY_NOTES = 6
+SWEEP_POINTS = 5000
+STARTUP_SCENARIO = 'dense'  # 历史最多的场景：验证首帧前不会加载今天以外的月份
+STARTUP_BUDGET_MS = 1000    # 从启动进程到首帧画完
+
+COLORS = [[255, 99, 71], [100, 180, 255], [120, 220, 120], [255, 200, 80], [200, 120, 255]]
+
+def make_day(rng, lo, hi, n_segs, notes_every, n_notes=0):
+    segs = []
+    for _ in range(n_segs):
+        a = rng.randint(lo, hi - 1)
+        segs.append({'start': a, 'end': min(hi, a + rng.randint(5, 120)), 'color': rng.choice(COLORS), 'text': "bench"})
+    if notes_every: minutes = range(lo, hi, notes_every)
+    else: minutes = rng.sample(range(lo, hi), min(n_notes, hi - lo))
+    notes = {str(m): {'color': rng.choice(COLORS), 'text': f"note {m}"} for m in minutes}
+    return {'segments': segs, 'notes': notes}
+
+def write_fixture(root, sc, seed=0):
+    # config.json + data/YYYY-MM.json (schema v2)，今天放满，过去 years 年每天放少量数据
+    rng = random.Random(seed)
+    sh, sm = map(int, sc['start'].split(':'))
+    eh, em = map(int, sc['end'].split(':'))
+    lo, hi = sh * 60 + sm, eh * 60 + em
+    cfg = {'start_time': sc['start'], 'end_time': sc['end'], 'interval': sc['interval'], 'row_duration': 60,
+           'sound_backend': 'null', 'schema_version': T.SCHEMA_VERSION}
+    with open(os.path.join(root, 'config.json'), 'w') as f: json.dump(cfg, f)
+    today = date.today()
+    shards = {}
+    for back in range(sc['years'] * 365, 0, -1):
+        d = today - timedelta(days=back)
+        day = make_day(rng, lo, hi, rng.randint(0, HISTORY_SEGMENTS), 0, HISTORY_NOTES)
+        shards.setdefault(d.strftime("%Y-%m"), {})[d.isoformat()] = day
+    shards.setdefault(today.strftime("%Y-%m"), {})[today.isoformat()] = make_day(rng, lo, hi, sc['segments'], sc['notes_every'])
+    os.makedirs(os.path.join(root, 'data'), exist_ok=True)
+    for month, days in shards.items():
+        with open(os.path.join(root, 'data', f"{month}.json"), 'w') as f:
+            json.dump({'schema_version': T.SCHEMA_VERSION, 'days': days}, f)
+
+def measure(fn, repeat, number=1):
+    # 先预热一次；计时期间关闭 GC，减少抖动
+    fn()
+    gc.collect(); gc.disable()
+    samples = []
+    try:
+        for _ in range(repeat):
+            t = time.perf_counter()
+            for _ in range(number): fn()
+            samples.append((time.perf_counter() - t) * 1000 / number)
+    finally:
+        gc.enable()
+    return {'median_ms': round(statistics.median(samples), 4), 'min_ms': round(min(samples), 4),
+            'repeat': repeat, 'number': number}
+
+def sweep_points(w):
+    # 均匀网格，步长随窗口大小放大，使各场景的查询数量大致相同
+    r = w.current_content_rect
+    step = max(1, math.ceil(math.sqrt(r.width() * r.height() / SWEEP_POINTS)))
+    return [QPoint(x, y) for x in range(r.left(), r.right() + 1, step) for y in range(r.top(), r.bottom() + 1, step)]
+
+def settle(app, w, limit=500):
+    # 驱动帧循环直到插值收敛，返回帧数
+    frames = 0
+    w.kick_animation()
+    while w.timer.isActive() and frames < limit:
+        w.loop(); app.processEvents(); frames += 1
+    return frames
+
+def bench_scenario(app, name, sc, repeat):
+    root = tempfile.mkdtemp(prefix=f"timedots-bench-{name}-")
+    write_fixture(root, sc)
+    T.CONFIG_FILE = os.path.join(root, 'config.json')
+    w = T.TimeDotsWidget()
+    w.show(); app.processEvents()
+    # 等首帧之后的延迟初始化与提示音合成完成，避免它们与计时争抢 GIL
+    while not w.startup_done: app.processEvents()
+    w.sound.queue.join()
+    out = {}
+
+    def paint():
+        img = QImage(w.size() * w.devicePixelRatio(), QImage.Format.Format_ARGB32_Premultiplied)
+        img.setDevicePixelRatio(w.devicePixelRatio())
+        w.render(img)
+
+    def paint_cold():
+        # 等价于一次配置变化后的首帧：几何、布局、静态层全部重建
+        w.config_version += 1
+        paint()
+
+    paint()
+    out['paint_warm'] = measure(paint, repeat)
+    out['paint_cold'] = measure(paint_cold, repeat)
+
+    # 命中测试：展开状态下用均匀网格扫过整个内容区域，另记单次查询的微秒数
+    w._hover_val = w._header_val = 1.0
+    w.update_layout_dynamic()
+    pts = sweep_points(w)
+    out['hit_idx_sweep'] = measure(lambda: [w.get_idx_at_pos(p) for p in pts], repeat)
+    out['hit_seg_sweep'] = measure(lambda: [w.get_segment_at_pos(p) for p in pts], repeat)
+    for k in ('hit_idx_sweep', 'hit_seg_sweep'):
+        out[k]['queries'] = len(pts)
+        out[k]['per_query_us'] = round(out[k]['median_ms'] * 1000 / len(pts), 3)
+
+    # 分层 (原 calc_layers)：整体重建与单个时间块的增量插入/删除
+    def rebuild_layers():
+        w.reset_segment_index()
+        w.get_segment_index()
+    out['segment_index_build'] = measure(rebuild_layers, repeat)
+    idx = w.get_segment_index()
+    base = w.grid_base()
+    probe = {'start': base + 30, 'end': base + 90, 'color': COLORS[0], 'text': ""}
+    def insert_remove():
+        idx.insert(probe); idx.remove(probe)
+    out['segment_index_insert'] = measure(insert_remove, repeat, number=20)
+
+    # 配置与存储：load_config 会重新打开数据存储，随后读取今天 (冷启动路径)
+    def load():
+        w.load_config()
+        w.get_current_data()
+    out['load_config'] = measure(load, repeat)
+    def save():
+        w.data_store.mark_dirty(w.current_view_key())
+        w._last_settings_dump = None
+        w.save_config()
+        w.persistence.flush()
+    out['save_config'] = measure(save, repeat)
+
+    # 模拟空闲的一分钟：一次分钟时钟 (当前圆点、进行中的时间块、提醒) 加上随之而来的局部重绘
+    w._hover_val = w._header_val = 0.0
+    w.update_layout_dynamic(); w.timer.stop()
+    def minute():
+        w._last_tick_mins = None
+        w.on_clock_tick()
+        app.processEvents()
+    out['minute_idle'] = measure(minute, repeat)
+
+    # 一次完整的悬停展开 + 收起，每帧都执行 loop 与重绘
+    inside = w.mapToGlobal(w.current_content_rect.center())
+    outside = w.mapToGlobal(QPoint(-200, -200))
+    frames = []
+    def hover_cycle():
+        QCursor.setPos(inside); frames.append(settle(app, w))
+        QCursor.setPos(outside); frames.append(settle(app, w))
+    out['hover_cycle'] = measure(hover_cycle, repeat)
+    out['hover_cycle']['frames'] = max(frames) if frames else 0
+
+    # 年视图：整年热力格的稳定帧 (网格层命中缓存)，以及某天被修改后只重算那一天汇总的重建帧
+    w._hover_val = w._header_val = 1.0
+    w.set_view_mode('year')
+    w.update_layout_dynamic(); w.timer.stop()
+    paint()
+    out['paint_year_warm'] = measure(paint, repeat)
+    today = w.current_view_key()
+    def paint_year_edit():
+        w.summaries.invalidate((today,))
+        paint()
+    out['paint_year_edit'] = measure(paint_year_edit, repeat)
+    w.set_view_mode('day')
+
+    w.persistence.flush()
+    w.tray.hide()
+    w.close(); w.deleteLater(); app.processEvents()
+    return out
+
+def startup_probe(root):
+    # 子进程入口：分别报告 import、构造、首帧与首帧之后的延迟初始化完成时刻 (相对脚本开始)
+    t_import = time.perf_counter()
+    T.CONFIG_FILE = os.path.join(root, 'config.json')
+    app = T.QApplication(sys.argv)
+    app.setQuitOnLastWindowClosed(False)
+    w = T.TimeDotsWidget()
+    t_ctor = time.perf_counter()
+    w.show()
+    while w.first_frame_at is None: app.processEvents()
+    first = {'import_ms': (t_import - PROBE_T0) * 1000, 'construct_ms': (t_ctor - t_import) * 1000,
+             'first_frame_ms': (w.first_frame_at - PROBE_T0) * 1000,
+             'months_at_first_frame': len(getattr(w.data_store, 'loaded_months', ()))}
+    print("FIRST " + json.dumps(first), flush=True)
+    while not w.startup_done: app.processEvents()
+    print("READY " + json.dumps({'ready_ms': (time.perf_counter() - PROBE_T0) * 1000}), flush=True)
+    w.persistence.flush()
+
+def bench_startup(repeat, budget_ms):
+    root = tempfile.mkdtemp(prefix="timedots-bench-startup-")
+    write_fixture(root, SCENARIOS[STARTUP_SCENARIO])
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    env.pop(T.PERF_ENV, None)
+    samples = {}
+    def add(k, v): samples.setdefault(k, []).append(v)
+    for _ in range(repeat):
+        t = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--startup-probe', root],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env, text=True)
+        for line in proc.stdout:
+            tag, _, payload = line.partition(' ')
+            if tag == 'FIRST':
+                # 进程视角：从 spawn 到首帧 (含解释器启动)
+                add('spawn_to_first_frame', (time.perf_counter() - t) * 1000)
+                for k, v in json.loads(payload).items(): add(k, v)
+            elif tag == 'READY':
+                add('ready', json.loads(payload)['ready_ms'])
+        proc.wait()
+    out = {}
+    for k, vals in samples.items():
+        out[k] = {'median_ms': round(statistics.median(vals), 4), 'min_ms': round(min(vals), 4), 'repeat': len(vals), 'number': 1}
+    if 'spawn_to_first_frame' in out:
+        out['spawn_to_first_frame']['budget_ms'] = budget_ms
+        out['spawn_to_first_frame']['within_budget'] = out['spawn_to_first_frame']['median_ms'] <= budget_ms
+    if 'months_at_first_frame' in out:
+        # 这是个计数而不是耗时，只为了在结果里看到首帧前加载了几个月份
+        out['months_at_first_frame'] = {'count': out['months_at_first_frame']['median_ms']}
+    return out
+
+def run(names, repeat, startup_budget=None):
+    app = T.QApplication.instance() or T.QApplication(sys.argv)
+    app.setQuitOnLastWindowClosed(False)
+    results = {}
+    for name in names:
+        for k, v in bench_scenario(app, name, SCENARIOS[name], repeat).items():
+            results[f"{name}/{k}"] = v
+    if startup_budget is not None:
+        for k, v in bench_startup(repeat, startup_budget).items():
+            results[f"startup/{k}"] = v
+    meta = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'qt': QT_VERSION_STR,
+        'numpy': T.HAS_NUMPY,
+        'repeat': repeat,
+        'scenarios': {n: SCENARIOS[n] for n in names},
+    }
+    return {'meta': meta, 'results': results}
+
+def compare(current, baseline, tolerance):
+    # 只比较中位数；超过 (1 + tolerance) 倍的记为退化
+    regressions = []
+    base = baseline.get('results', {})
+    print(f"{'benchmark':36s} {'baseline':>10s} {'current':>10s} {'ratio':>7s}")
+    for key, cur in sorted(current['results'].items()):
+        if 'median_ms' not in cur: continue
+        old = base.get(key)
+        if not old:
+            print(f"{key:36s} {'-':>10s} {cur['median_ms']:10.3f} {'new':>7s}")
+            continue
+        ratio = cur['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  REGRESSION'; regressions.append(key)
+        elif ratio < 1 - tolerance:
+            flag = '  faster'
+        print(f"{key:36s} {old['median_ms']:10.3f} {cur['median_ms']:10.3f} {ratio:7.2f}{flag}")
+    return regressions
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Time Dots 性能基准 (offscreen)")
+    ap.add_argument('--out', help="结果 JSON 输出路径 (默认打印到标准输出)")
+    ap.add_argument('--baseline', help="与之前保存的结果 JSON 对比")
+    ap.add_argument('--tolerance', type=float, default=0.25, help="中位数允许的相对退化 (默认 0.25)")
+    ap.add_argument('--repeat', type=int, default=7)
+    ap.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help="只运行指定场景 (可重复)")
+    ap.add_argument('--startup-budget', type=float, default=STARTUP_BUDGET_MS, help="首帧耗时预算 ms")
+    ap.add_argument('--no-startup', action='store_true', help="跳过启动耗时测量")
+    ap.add_argument('--startup-probe', metavar='DIR', help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+    if args.startup_probe:
+        startup_probe(args.startup_probe)
+        return 0
+
+    result = run(args.scenario or list(SCENARIOS), max(1, args.repeat), None if args.no_startup else args.startup_budget)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, 'w') as f: f.write(text)
+    elif not args.baseline:
+        print(text)
+    if args.baseline:
+        with open(args.baseline) as f: baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            return 1
+    first = result['results'].get('startup/spawn_to_first_frame')
+    if first and not first['within_budget']:
+        print(f"startup: first frame {first['median_ms']:.0f} ms exceeds budget {first['budget_ms']:.0f} ms", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
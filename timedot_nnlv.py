@@ -4,17 +4,31 @@ import os
 import math
 import platform
 import threading
+import queue
 import copy
-from datetime import datetime, time, timedelta
+import heapq
+import sqlite3
+import types
+import csv
+import argparse
+import io
+import wave
+import shutil
+import subprocess
+from time import monotonic, perf_counter
+from collections import deque, namedtuple
+from datetime import datetime, time, timedelta, timezone
 from PyQt6.QtWidgets import (QApplication, QWidget, QMenu, QDialog, QVBoxLayout, 
                              QHBoxLayout, QLabel, QTimeEdit, QComboBox, QSlider, 
                              QPushButton, QColorDialog, QSystemTrayIcon, QToolTip,
                              QFormLayout, QFrame, QTextEdit, QScrollArea, 
-                             QSpinBox, QDoubleSpinBox, QStyle)
+                             QSpinBox, QDoubleSpinBox, QStyle, QFileDialog, QMessageBox)
 from PyQt6.QtCore import (Qt, QTimer, QPoint, QRect, QRectF, QPropertyAnimation, 
-                          pyqtProperty, QEasingCurve, QPointF, QSize, QDate, QVariantAnimation)
+                          pyqtProperty, QEasingCurve, QPointF, QSize, QDate, QVariantAnimation,
+                          QFileSystemWatcher)
 from PyQt6.QtGui import (QPainter, QBrush, QColor, QAction, QMouseEvent, QWheelEvent,
-                         QCursor, QIcon, QPixmap, QFont, QPen, QPainterPath, QFontMetrics, QGuiApplication, QRegion)
+                         QCursor, QIcon, QPixmap, QFont, QPen, QPainterPath, QFontMetrics, QGuiApplication, QRegion,
+                         QPolygonF, QActionGroup)
 
 # --- 常量定义 ---
 BASE_MARGIN = 16       
@@ -23,11 +37,15 @@ CALENDAR_HEIGHT = 30
 GAP_WIDTH_NARROW = 14  # 虚线处的紧凑间距
 GAP_WIDTH_WIDE = 36    # 整点数字处的宽敞间距   
 HEADER_FULL_HEIGHT = 42 
+HEADER_MIN_WIDTH = 16 + (6*2 + 8)*2 + 6*2 + 16  # 红绿灯一行 (左右边距 + 三个按钮与间距) 需要的最小宽度
 FOOTER_GAP = 25        
 MIN_CAL_STEP = 24      
 ARROW_MARGIN = 35      
 # [核心] 这里的 Padding 必须足够大，容纳圆角、阴影以及布局计算的微小误差
 GEOMETRY_PADDING = 20  
+DIRTY_MARGIN = 2       # 局部重绘矩形向外扩的像素 (抗锯齿边缘)
+FRAME_MS = 16          # 动画帧间隔，只在插值进行时运行
+LOCK_REVEAL_MS = 1200  # 锁定状态下光标停留多久后浮现红绿灯
 
 DEFAULT_CONFIG_VALUES = {
     'dot_radius': 5,
@@ -43,14 +61,24 @@ DEFAULT_CONFIG_VALUES = {
 
 # --- 系统环境检测 ---
 IS_WINDOWS = platform.system() == "Windows"
-HAS_SOUND = False
+HAS_WINSOUND = False
 
 if IS_WINDOWS:
     try:
         import winsound
-        HAS_SOUND = True
+        HAS_WINSOUND = True
     except ImportError:
-        HAS_SOUND = False
+        HAS_WINSOUND = False
+
+# 可选：NumPy 用于几何前缀和，缺失时退回标准库 array
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+from array import array
+from itertools import accumulate
+from bisect import bisect_left, bisect_right
 
 def get_config_path():
     if getattr(sys, 'frozen', False):
@@ -61,6 +89,1340 @@ def get_config_path():
 
 CONFIG_FILE = get_config_path()
 
+def get_data_dir():
+    # 每日数据按月分片，存放在 config.json 同级的 data 目录下
+    return os.path.join(os.path.dirname(CONFIG_FILE), 'data')
+
+def get_db_path():
+    return os.path.join(os.path.dirname(CONFIG_FILE), 'timedots.db')
+
+# --- 数据结构版本与迁移 ---
+# v1: segment 的 start/end 与 note 的键是相对 "开始时间整点" 的分钟偏移
+# v2: 全部改为相对当天 0 点的绝对分钟数 (跨午夜的计划可以超过 1440)
+SCHEMA_VERSION = 2
+
+def _migrate_day_v1(day, legacy_base):
+    for s in day.get('segments', []):
+        s['start'] += legacy_base
+        s['end'] += legacy_base
+        s.pop('end_abs', None)
+    day['notes'] = {str(int(k) + legacy_base): v for k, v in day.get('notes', {}).items()}
+
+DAY_MIGRATIONS = {1: _migrate_day_v1}
+
+def migrate_day(day, version, legacy_base):
+    # 逐级升级单天数据 (原地修改)，legacy_base 为旧数据对应的开始整点分钟数
+    while version < SCHEMA_VERSION:
+        DAY_MIGRATIONS[version](day, legacy_base)
+        version += 1
+    return day
+
+# 没有任何记录的日期共用这一份只读的空数据，读取时不会往存储里插入新条目
+EMPTY_DAY = types.MappingProxyType({"segments": (), "notes": types.MappingProxyType({})})
+
+def dedupe_segments(day):
+    # 去掉完全相同 (起止、颜色、备注) 的重复时间块，返回去掉的个数
+    segs = day.get('segments', [])
+    seen = set()
+    kept = []
+    for s in segs:
+        sig = (s['start'], s['end'], tuple(s.get('color', ())), s.get('text', ""))
+        if sig in seen: continue
+        seen.add(sig)
+        kept.append(s)
+    removed = len(segs) - len(kept)
+    if removed: segs[:] = kept
+    return removed
+
+def is_empty_day(day):
+    return not day.get('segments') and not day.get('notes')
+
+def day_signature(day):
+    # 用于比较两份 day 数据是否相同 (layer 是布局时算出来的，不参与比较)
+    if day is None: return None
+    segs = [{k: v for k, v in s.items() if k != 'layer'} for s in day.get('segments', [])]
+    return json.dumps([segs, day.get('notes', {})], sort_keys=True)
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+# --- 数据存储 ---
+class ShardedDayStore:
+    # 以日期字符串 (ISO) 为键的 day 数据，按月分片成 data/YYYY-MM.json
+    # 只在访问到某个月时才加载对应分片，只写回被修改过的分片
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.days = {}
+        self.loaded_months = set()
+        self.dirty_months = set()
+        self.dirty_days = set()
+        self.signatures = {}
+        self.legacy_base = 0 
+
+    @staticmethod
+    def month_of(key):
+        return key[:7]
+
+    def shard_path(self, month):
+        return os.path.join(self.data_dir, f"{month}.json")
+
+    def read_shard(self, month):
+        # 返回 (days, 是否做过升级)。v1 分片是裸的 {date: day}，v2 带 schema_version
+        with open(self.shard_path(month), 'r') as f:
+            d = json.load(f)
+        version = d.get('schema_version', 1) if 'days' in d else 1
+        days = d['days'] if 'days' in d else d
+        if version >= SCHEMA_VERSION: return days, False
+        for day in days.values():
+            migrate_day(day, version, self.legacy_base)
+        return days, True
+
+    def ensure_month(self, month):
+        if month in self.loaded_months: return
+        self.loaded_months.add(month)
+        self.signatures[month] = file_signature(self.shard_path(month))
+        if not os.path.exists(self.shard_path(month)): return
+        try:
+            days, migrated = self.read_shard(month)
+            for k, v in days.items():
+                self.days.setdefault(k, v)
+            if migrated: self.dirty_months.add(month)
+        except Exception as e:
+            print(f"Shard load error ({month}): {e}")
+
+    def list_months(self):
+        if not os.path.isdir(self.data_dir): return set()
+        return {n[:-5] for n in os.listdir(self.data_dir) if n.endswith('.json')}
+
+    def migrate_all(self):
+        # 一次性流式升级：每次只读入一个月的分片，升级后原子写回
+        for month in sorted(self.list_months() - self.loaded_months):
+            try:
+                days, migrated = self.read_shard(month)
+                if migrated:
+                    atomic_write_text(self.shard_path(month), json.dumps({'schema_version': SCHEMA_VERSION, 'days': days}))
+            except Exception as e:
+                print(f"Shard migrate error ({month}): {e}")
+
+    def ensure_range(self, first_date, last_date):
+        # 预加载一段日期 (QDate) 覆盖到的所有月份，例如日历条的可见范围
+        d = QDate(first_date.year(), first_date.month(), 1)
+        while d <= last_date:
+            self.ensure_month(d.toString("yyyy-MM"))
+            d = d.addMonths(1)
+
+    def __contains__(self, key):
+        self.ensure_month(self.month_of(key))
+        return key in self.days
+
+    def __getitem__(self, key):
+        self.ensure_month(self.month_of(key))
+        return self.days[key]
+
+    def get(self, key, default=None):
+        self.ensure_month(self.month_of(key))
+        return self.days.get(key, default)
+
+    def setdefault(self, key, default):
+        self.ensure_month(self.month_of(key))
+        if key not in self.days:
+            self.days[key] = default
+            self.mark_dirty(key)
+        return self.days[key]
+
+    def mark_dirty(self, key):
+        self.dirty_months.add(self.month_of(key))
+        self.dirty_days.add(key)
+
+    def has_dirty(self):
+        return bool(self.dirty_months)
+
+    def watch_paths(self):
+        os.makedirs(self.data_dir, exist_ok=True)
+        paths = [self.data_dir]
+        for month in self.loaded_months:
+            if os.path.exists(self.shard_path(month)): paths.append(self.shard_path(month))
+        return paths
+
+    def reload_external(self):
+        # 检查已加载的分片是否被其他进程/同步工具改过，逐天合并变化，返回变化的日期
+        # 本地还没保存的日期以本地为准
+        changed = set()
+        for month in sorted(self.loaded_months):
+            path = self.shard_path(month)
+            sig = file_signature(path)
+            if sig == self.signatures.get(month): continue
+            try:
+                disk = self.read_shard(month)[0] if sig else {}
+            except Exception as e:
+                # 可能正在被写入，等下一次变更通知
+                print(f"Shard reload error ({month}): {e}")
+                continue
+            self.signatures[month] = sig
+            for k in set(disk) | set(self.month_snapshot(month)):
+                if k in self.dirty_days: continue
+                new = disk.get(k)
+                if day_signature(new) == day_signature(self.days.get(k)): continue
+                if new is None: del self.days[k]
+                else: self.days[k] = new
+                changed.add(k)
+        return changed
+
+    def iter_days(self):
+        # 逐个分片读取全部历史，已加载的月份使用内存中的版本，未加载的月份不会被缓存
+        for month in sorted(self.list_months() | self.loaded_months):
+            if month in self.loaded_months:
+                days = self.month_snapshot(month)
+            else:
+                try:
+                    days, _ = self.read_shard(month)
+                except Exception as e:
+                    print(f"Shard load error ({month}): {e}")
+                    continue
+            for k in sorted(days):
+                yield k, days[k]
+
+    def import_legacy(self, data_store):
+        # 旧版 config.json 中内嵌的 data_store (v1)，迁移到分片中 (已有分片的日期优先)
+        for k, v in data_store.items():
+            self.ensure_month(self.month_of(k))
+            if k not in self.days:
+                self.days[k] = migrate_day(v, 1, self.legacy_base)
+                self.mark_dirty(k)
+
+    def month_snapshot(self, month):
+        return {k: v for k, v in self.days.items() if self.month_of(k) == month}
+
+    def compact(self):
+        # 逐月清理：删掉空白日期、合并重复时间块，只重写有变化的分片
+        # 返回 (删除的天数, 合并的时间块数, 回收的字节数)；调用前应先把待写数据落盘
+        dropped = deduped = reclaimed = 0
+        for month in sorted(self.list_months() | self.loaded_months):
+            path = self.shard_path(month)
+            before = os.path.getsize(path) if os.path.exists(path) else 0
+            try:
+                days = self.month_snapshot(month) if month in self.loaded_months else self.read_shard(month)[0]
+            except Exception as e:
+                print(f"Shard load error ({month}): {e}")
+                continue
+            changed = 0
+            kept = {}
+            for k, day in days.items():
+                n = dedupe_segments(day)
+                deduped += n
+                changed += n
+                if is_empty_day(day):
+                    dropped += 1
+                    changed += 1
+                    self.days.pop(k, None)
+                else:
+                    kept[k] = day
+            if not changed: continue
+            if kept:
+                text = json.dumps({'schema_version': SCHEMA_VERSION, 'days': kept})
+                atomic_write_text(path, text)
+                reclaimed += before - len(text)
+            elif os.path.exists(path):
+                os.remove(path)
+                reclaimed += before
+            if month in self.loaded_months: self.signatures[month] = file_signature(path)
+        return dropped, deduped, reclaimed
+
+    def take_dirty_jobs(self):
+        # 在 GUI 线程上对脏分片做深拷贝快照，返回交给后台线程执行的写盘任务 (job, restore)。
+        # 写盘失败时由 GUI 线程调用 restore 重新标脏，下一次保存会再试
+        jobs = []
+        for month in sorted(self.dirty_months):
+            snap = copy.deepcopy(self.month_snapshot(month))
+            path = self.shard_path(month)
+            days = {k for k in self.dirty_days if self.month_of(k) == month}
+            def job(path=path, snap=snap, month=month):
+                os.makedirs(self.data_dir, exist_ok=True)
+                atomic_write_text(path, json.dumps({'schema_version': SCHEMA_VERSION, 'days': snap}))
+                # 记下自己写出的文件签名，文件监视器据此忽略自己的写入
+                self.signatures[month] = file_signature(path)
+            def restore(month=month, days=days):
+                self.dirty_months.add(month)
+                self.dirty_days |= days
+            jobs.append((job, restore))
+        self.dirty_months.clear()
+        self.dirty_days.clear()
+        return jobs
+
+class SqliteDayStore:
+    # 可选的 SQLite 后端 (config: storage_backend = 'sqlite')
+    # segments / notes 两张表按日期建索引，按天懒加载，按天写回对应的行
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS segments (
+            date TEXT NOT NULL, seq INTEGER NOT NULL,
+            start_min INTEGER NOT NULL, end_min INTEGER NOT NULL,
+            color TEXT, layer INTEGER, text TEXT, extra TEXT);
+        CREATE INDEX IF NOT EXISTS idx_segments_date ON segments(date);
+        CREATE TABLE IF NOT EXISTS notes (
+            date TEXT NOT NULL, minute TEXT NOT NULL, color TEXT, text TEXT,
+            PRIMARY KEY (date, minute));
+    """
+    SEG_KEYS = ('start', 'end', 'color', 'layer', 'text')
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.is_new = not os.path.exists(db_path)
+        self.conn = self._connect()
+        self.conn.executescript(self.SCHEMA)
+        if self.is_new:
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        # 写线程的连接：事务在后台线程执行，GUI 线程只在持锁时读取它的 data_version
+        self._writer = self._connect(check_same_thread=False)
+        self._writer_lock = threading.Lock()
+        self.days = {}
+        self.loaded_days = set()
+        self.dirty_days = set()
+        self.legacy_base = 0
+        self.data_version = self._data_version()
+        self.external_version = self._external_version()
+
+    def _data_version(self):
+        # 其他连接 (包括本进程的写线程) 提交后会变化
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _external_version(self):
+        # 写线程连接看到的 data_version：自己的提交不会改变它，只有其他连接 (其他进程、同步工具) 提交时才变化
+        with self._writer_lock:
+            return self._writer.execute("PRAGMA data_version").fetchone()[0]
+
+    def watch_paths(self):
+        return [p for p in (self.db_path, self.db_path + '-wal') if os.path.exists(p)]
+
+    def reload_external(self):
+        # 数据库有新的提交时，逐天重新查询已加载的日期并与内存比较
+        dv = self._data_version()
+        if dv == self.data_version: return set()
+        self.data_version = dv
+        # 自上次检查以来只有自己的写线程提交过：内存里已是最新，不能用数据库的副本替换 (会打断对象引用)。
+        # 先读外部版本再查询，查询结果至少包含这个版本之前的所有外部提交
+        ev = self._external_version()
+        if ev == self.external_version: return set()
+        self.external_version = ev
+        changed = set()
+        keys = sorted(self.loaded_days - self.dirty_days)
+        if not keys: return changed
+        # 一次区间查询取回所有已加载的日期，而不是逐天查询
+        disk = self._load_rows("date BETWEEN ? AND ?", (keys[0], keys[-1]))
+        for k in keys:
+            new = disk.get(k)
+            if day_signature(new) == day_signature(self.days.get(k)): continue
+            if new is None: del self.days[k]
+            else: self.days[k] = new
+            changed.add(k)
+        return changed
+
+    def _connect(self, check_same_thread=True):
+        conn = sqlite3.connect(self.db_path, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _load_rows(self, where, args):
+        days = {}
+        for date, start, end, color, layer, text, extra in self.conn.execute(
+                f"SELECT date, start_min, end_min, color, layer, text, extra FROM segments WHERE {where} ORDER BY date, seq", args):
+            seg = json.loads(extra) if extra else {}
+            seg.update({'start': start, 'end': end, 'color': json.loads(color), 'layer': layer or 0, 'text': text or ""})
+            days.setdefault(date, {"segments": [], "notes": {}})['segments'].append(seg)
+        for date, minute, color, text in self.conn.execute(
+                f"SELECT date, minute, color, text FROM notes WHERE {where}", args):
+            days.setdefault(date, {"segments": [], "notes": {}})['notes'][minute] = {'color': json.loads(color), 'text': text or ""}
+        return days
+
+    def ensure_day(self, key):
+        if key in self.loaded_days: return
+        self.loaded_days.add(key)
+        day = self._load_rows("date = ?", (key,)).get(key)
+        if day is not None: self.days.setdefault(key, day)
+
+    def ensure_range(self, first_date, last_date):
+        # 区间查询：一次索引范围扫描加载一周/一个月的数据
+        first = first_date.toString(Qt.DateFormat.ISODate)
+        last = last_date.toString(Qt.DateFormat.ISODate)
+        for k, day in self._load_rows("date BETWEEN ? AND ?", (first, last)).items():
+            if k not in self.loaded_days: self.days.setdefault(k, day)
+        d = first_date
+        while d <= last_date:
+            self.loaded_days.add(d.toString(Qt.DateFormat.ISODate))
+            d = d.addDays(1)
+
+    def __contains__(self, key):
+        self.ensure_day(key)
+        return key in self.days
+
+    def __getitem__(self, key):
+        self.ensure_day(key)
+        return self.days[key]
+
+    def get(self, key, default=None):
+        self.ensure_day(key)
+        return self.days.get(key, default)
+
+    def setdefault(self, key, default):
+        self.ensure_day(key)
+        if key not in self.days:
+            self.days[key] = default
+            self.mark_dirty(key)
+        return self.days[key]
+
+    def mark_dirty(self, key):
+        self.dirty_days.add(key)
+
+    def has_dirty(self):
+        return bool(self.dirty_days)
+
+    def import_legacy(self, data_store):
+        for k, v in data_store.items():
+            self.ensure_day(k)
+            if k not in self.days:
+                self.days[k] = migrate_day(v, 1, self.legacy_base)
+                self.mark_dirty(k)
+
+    def migrate_all(self):
+        # v1 -> v2：整体平移分钟数，由 SQLite 在一个事务里流式完成
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0] or 1
+        if version >= SCHEMA_VERSION: return
+        base = self.legacy_base
+        with self.conn:
+            self.conn.execute("UPDATE segments SET start_min = start_min + ?, end_min = end_min + ?", (base, base))
+            # 先加前缀再换算，避免主键 (date, minute) 在更新过程中冲突
+            self.conn.execute("UPDATE notes SET minute = 'v1:' || minute")
+            self.conn.execute("UPDATE notes SET minute = CAST(CAST(substr(minute, 4) AS INTEGER) + ? AS TEXT)", (base,))
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def iter_days(self):
+        dates = [r[0] for r in self.conn.execute(
+            "SELECT date FROM segments UNION SELECT date FROM notes ORDER BY 1")]
+        for k in sorted(set(dates) | {k for k in self.days if k in self.dirty_days}):
+            if k in self.loaded_days:
+                if k in self.days: yield k, self.days[k]
+            else:
+                day = self._load_rows("date = ?", (k,)).get(k)
+                if day is not None: yield k, day
+
+    def file_size(self):
+        return sum(os.path.getsize(p) for p in (self.db_path, self.db_path + '-wal') if os.path.exists(p))
+
+    def compact(self):
+        # 空白日期在表里本来就没有行，只需清掉内存里的空条目；重复行用 SQL 删除后 VACUUM
+        dropped = 0
+        for k in list(self.days):
+            dedupe_segments(self.days[k])
+            if is_empty_day(self.days[k]):
+                del self.days[k]
+                dropped += 1
+        before = self.file_size()
+        with self.conn:
+            cur = self.conn.execute(
+                "DELETE FROM segments WHERE rowid NOT IN "
+                "(SELECT MIN(rowid) FROM segments GROUP BY date, start_min, end_min, color, text)")
+            deduped = cur.rowcount
+        self.conn.execute("VACUUM")
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return dropped, deduped, before - self.file_size()
+
+    def take_dirty_jobs(self):
+        rows = []
+        for key in sorted(self.dirty_days):
+            day = copy.deepcopy(self.days.get(key, {"segments": [], "notes": {}}))
+            rows.append((key, day))
+        self.dirty_days.clear()
+        if not rows: return []
+        return [(lambda: self._write_days(rows), lambda: self.dirty_days.update(k for k, _ in rows))]
+
+    def _seg_row(self, key, i, s):
+        extra = {k: v for k, v in s.items() if k not in self.SEG_KEYS}
+        return (key, i, s['start'], s['end'], json.dumps(s.get('color', [255, 255, 255])),
+                s.get('layer', 0), s.get('text', ""), json.dumps(extra) if extra else None)
+
+    def _write_days(self, rows):
+        # 只在后台线程调用：写线程使用自己的连接，一个事务内替换这些日期的行
+        with self._writer_lock, self._writer as conn:
+            for key, day in rows:
+                conn.execute("DELETE FROM segments WHERE date = ?", (key,))
+                conn.execute("DELETE FROM notes WHERE date = ?", (key,))
+                conn.executemany(
+                    "INSERT INTO segments (date, seq, start_min, end_min, color, layer, text, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [self._seg_row(key, i, s) for i, s in enumerate(day.get('segments', []))])
+                conn.executemany(
+                    "INSERT INTO notes (date, minute, color, text) VALUES (?, ?, ?, ?)",
+                    [(key, m, json.dumps(n.get('color', [255, 80, 80])), n.get('text', ""))
+                     for m, n in day.get('notes', {}).items()])
+
+def open_sqlite_store(legacy_base):
+    store = SqliteDayStore(get_db_path())
+    if store.is_new:
+        # 首次切换到 SQLite：把已有的按月分片逐天导入
+        shards = ShardedDayStore(get_data_dir())
+        shards.legacy_base = legacy_base
+        for k, day in shards.iter_days():
+            store.days[k] = day
+            store.loaded_days.add(k)
+            store.mark_dirty(k)
+    return store
+
+def open_day_store(d):
+    # 根据 config.json 的内容 (dict) 打开数据存储，并完成一次性的数据迁移
+    # 返回 (store, 是否做过迁移)
+    migrated = False
+    # v1 数据以当时的开始整点为基准，这里只能以配置中的开始时间作为迁移基准
+    legacy_base = int(d.get('start_time', '09:00').split(':')[0]) * 60
+    if d.get('storage_backend', 'json') == 'sqlite':
+        store = open_sqlite_store(legacy_base)
+    else:
+        store = ShardedDayStore(get_data_dir())
+    store.legacy_base = legacy_base
+    if d.get('schema_version', 1) < SCHEMA_VERSION:
+        store.migrate_all()
+        migrated = True
+    # 旧版本把全部历史数据写在 config.json 里，这里一次性迁移到分片
+    if 'data_store' in d:
+        store.import_legacy(d['data_store'])
+    return store, migrated
+
+# --- 后台持久化 ---
+def atomic_write_text(path, text):
+    # 先写临时文件并 fsync，再原子替换，崩溃时不会留下被截断的文件
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class StoreWatcher:
+    # 监视数据文件的外部修改 (另一个实例、同步工具、脚本)，合并后只通知变化的日期
+    def __init__(self, get_store, on_changed, delay_ms=250):
+        self.get_store = get_store
+        self.on_changed = on_changed
+        self.watcher = QFileSystemWatcher()
+        self.watcher.fileChanged.connect(self.schedule)
+        self.watcher.directoryChanged.connect(self.schedule)
+        # 编辑器/同步工具往往连续写多次，合并成一次检查
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay_ms)
+        self.timer.timeout.connect(self.check)
+        self.refresh_paths()
+
+    def refresh_paths(self):
+        # 原子替换后文件会从监视列表里消失，需要重新加入；新加载的月份也在这里加入
+        try: paths = set(self.get_store().watch_paths())
+        except OSError: return
+        current = set(self.watcher.files()) | set(self.watcher.directories())
+        if current - paths: self.watcher.removePaths(list(current - paths))
+        if paths - current: self.watcher.addPaths(list(paths - current))
+
+    def schedule(self, *_):
+        self.timer.start()
+
+    def check(self):
+        changed = self.get_store().reload_external()
+        self.refresh_paths()
+        if changed: self.on_changed(changed)
+
+class PersistenceService:
+    # 合并短时间内的多次保存请求：GUI 线程只做快照，写盘由常驻工作线程完成。
+    # 任务是 (job, restore)：job 在工作线程执行；失败时 restore 回到 GUI 线程重新标脏，下次保存再写
+    def __init__(self, collect_jobs, on_error=None, delay_ms=400):
+        self.collect_jobs = collect_jobs
+        self.on_error = on_error
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay_ms)
+        self.timer.timeout.connect(self.submit)
+        self.queue = queue.Queue()
+        # 工作线程 -> GUI 线程的失败回报；有任务在写时用低频定时器收取
+        self.failed = queue.Queue()
+        self.poll = QTimer()
+        self.poll.setInterval(200)
+        self.poll.timeout.connect(self.collect_failures)
+        self.perf = None
+        self.requested_at = None
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def schedule(self):
+        # 固定窗口合并：窗口内的后续请求不再推迟写盘时间
+        if not self.timer.isActive():
+            self.requested_at = perf_counter()
+            self.timer.start()
+
+    def submit(self):
+        self.timer.stop()
+        # 先收回之前失败的任务，让它们进入这次的快照
+        self.collect_failures()
+        requested, self.requested_at = self.requested_at or perf_counter(), None
+        jobs = self.collect_jobs()
+        if jobs:
+            self.queue.put((jobs, requested))
+            self.poll.start()
+
+    def flush(self, notify=True):
+        # 同步落盘：提交当前快照并等待工作线程写完 (用于退出)，返回这次写盘的错误
+        self.submit()
+        self.queue.join()
+        return self.collect_failures(notify)
+
+    def collect_failures(self, notify=True):
+        # 只在 GUI 线程调用。先看队列是否已空再收取，避免漏掉收取之后才报告的失败
+        idle = not self.queue.unfinished_tasks
+        errors = []
+        while True:
+            try: restore, e = self.failed.get_nowait()
+            except queue.Empty: break
+            restore()
+            errors.append(e)
+        if idle: self.poll.stop()
+        if errors and notify and self.on_error: self.on_error(errors)
+        return errors
+
+    def _run(self):
+        while True:
+            jobs, requested = self.queue.get()
+            try:
+                t = perf_counter()
+                for job, restore in jobs:
+                    try: job()
+                    except Exception as e:
+                        print(f"Save error: {e}")
+                        self.failed.put((restore, e))
+                perf = self.perf
+                if perf:
+                    # save：写盘本身耗时；save_latency：从第一次请求保存到落盘
+                    done = perf_counter()
+                    perf.record('save', (done - t) * 1000)
+                    perf.record('save_latency', (done - requested) * 1000)
+            finally:
+                self.queue.task_done()
+
+# --- 导入 / 导出 ---
+# 全部以生成器逐天处理：导出时逐个分片读取，导入时逐条解析后合并进存储
+EXPORT_FORMATS = ('ndjson', 'csv', 'ics')
+CSV_FIELDS = ['date', 'kind', 'start', 'end', 'color', 'text']
+
+def guess_format(path, fmt=None):
+    if fmt: return fmt
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if ext in ('jsonl', 'json'): return 'ndjson'
+    return ext if ext in EXPORT_FORMATS else 'ndjson'
+
+def color_to_hex(c):
+    return '#{:02x}{:02x}{:02x}'.format(*c[:3])
+
+def hex_to_color(h, default=(255, 255, 255)):
+    h = (h or '').strip().lstrip('#')
+    if len(h) != 6: return list(default)
+    return [int(h[i:i+2], 16) for i in (0, 2, 4)]
+
+def minute_to_dt(key, minute):
+    return datetime.strptime(key, "%Y-%m-%d") + timedelta(minutes=int(minute))
+
+def ics_escape(text):
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+def ics_unescape(text):
+    out, i = [], 0
+    while i < len(text):
+        ch = text[i]
+        if ch == '\\' and i + 1 < len(text):
+            nxt = text[i + 1]
+            out.append('\n' if nxt in 'nN' else nxt)
+            i += 2
+        else:
+            out.append(ch)
+            i += 1
+    return ''.join(out)
+
+def ics_fold(line):
+    # RFC 5545：每行不超过 75 个字节，续行以空格开头
+    out = []
+    b = line.encode('utf-8')
+    while len(b) > 75:
+        cut = 75 if not out else 74
+        while (b[cut] & 0xC0) == 0x80: cut -= 1
+        out.append(b[:cut].decode('utf-8'))
+        b = b[cut:]
+    out.append(b.decode('utf-8'))
+    return '\r\n '.join(out)
+
+def write_ndjson(days, f):
+    for k, day in days:
+        f.write(json.dumps({'date': k, 'segments': list(day.get('segments', [])), 'notes': dict(day.get('notes', {}))}, ensure_ascii=False) + '\n')
+        yield k
+
+def write_csv(days, f):
+    w = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+    w.writeheader()
+    for k, day in days:
+        for s in day.get('segments', []):
+            w.writerow({'date': k, 'kind': 'segment', 'start': s['start'], 'end': s['end'],
+                        'color': color_to_hex(s.get('color', [255, 255, 255])), 'text': s.get('text', "")})
+        for m, n in sorted(day.get('notes', {}).items(), key=lambda x: int(x[0])):
+            w.writerow({'date': k, 'kind': 'note', 'start': m, 'end': '',
+                        'color': color_to_hex(n.get('color', [255, 80, 80])), 'text': n.get('text', "")})
+        yield k
+
+def write_ics(days, f):
+    # 只导出时间块 (VEVENT)，时间使用本地浮动时间
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Time Dots//EN\r\n")
+    for k, day in days:
+        for i, s in enumerate(day.get('segments', [])):
+            lines = [
+                "BEGIN:VEVENT",
+                f"UID:{k}-{s['start']}-{s['end']}-{i}@timedots",
+                f"DTSTAMP:{stamp}",
+                f"DTSTART:{minute_to_dt(k, s['start']).strftime('%Y%m%dT%H%M%S')}",
+                f"DTEND:{minute_to_dt(k, s['end']).strftime('%Y%m%dT%H%M%S')}",
+                f"SUMMARY:{ics_escape(s.get('text', ''))}",
+                f"X-TIMEDOTS-COLOR:{color_to_hex(s.get('color', [255, 255, 255]))}",
+                "END:VEVENT"]
+            f.write(''.join(ics_fold(l) + '\r\n' for l in lines))
+        yield k
+    f.write("END:VCALENDAR\r\n")
+
+# 读取函数逐条产出 (日期, day)；无法解析的行/事件不中断读取，只把位置记进 skipped
+
+IMPORT_ERRORS = (ValueError, KeyError, TypeError, AttributeError)
+
+def read_ndjson(f, skipped):
+    for n, line in enumerate(f, 1):
+        line = line.strip()
+        if not line: continue
+        try:
+            d = json.loads(line)
+            rec = d['date'], {'segments': d.get('segments', []), 'notes': d.get('notes', {})}
+        except IMPORT_ERRORS:
+            skipped.append(n)
+            continue
+        yield rec
+
+def read_csv(f, skipped):
+    # 相邻的同日期行合并成一天
+    cur_key, cur = None, None
+    reader = csv.DictReader(f)
+    for row in reader:
+        k = row['date']
+        if k != cur_key:
+            if cur is not None: yield cur_key, cur
+            cur_key, cur = k, {'segments': [], 'notes': {}}
+        try:
+            col = hex_to_color(row.get('color'))
+            if row.get('kind') == 'note':
+                cur['notes'][str(int(row['start']))] = {'color': col, 'text': row.get('text') or ""}
+            else:
+                cur['segments'].append({'start': int(row['start']), 'end': int(row['end']), 'color': col, 'layer': 0, 'text': row.get('text') or ""})
+        except IMPORT_ERRORS:
+            skipped.append(reader.line_num)
+    if cur is not None: yield cur_key, cur
+
+def parse_ics_dt(value, params):
+    if 'VALUE=DATE' in params and 'T' not in value: return None
+    if value.endswith('Z'):
+        dt = datetime.strptime(value[:-1], "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc)
+        return dt.astimezone().replace(tzinfo=None)
+    return datetime.strptime(value[:15], "%Y%m%dT%H%M%S")
+
+def read_ics(f, skipped):
+    def unfolded():
+        prev = None
+        for raw in f:
+            line = raw.rstrip('\r\n')
+            if line[:1] in (' ', '\t') and prev is not None:
+                prev += line[1:]
+                continue
+            if prev is not None: yield prev
+            prev = line
+        if prev is not None: yield prev
+    ev = None
+    for line in unfolded():
+        if line == 'BEGIN:VEVENT':
+            ev = {'text': "", 'color': None}
+        elif line == 'END:VEVENT' and ev is not None:
+            start, end = ev.get('DTSTART'), ev.get('DTEND')
+            rec = None
+            if start and end and end > start:
+                day0 = datetime.combine(start.date(), time(0, 0))
+                try:
+                    rec = start.date().isoformat(), {'segments': [{
+                        'start': int((start - day0).total_seconds() // 60),
+                        'end': int((end - day0).total_seconds() // 60),
+                        'color': hex_to_color(ev['color']), 'layer': 0, 'text': ev['text']}], 'notes': {}}
+                except IMPORT_ERRORS:
+                    skipped.append(start.date().isoformat())
+            elif ev.get('bad'):
+                # 时间解析失败 (全天事件的时间也是 None，但不算错误，直接忽略)
+                skipped.append(ev['text'])
+            ev = None
+            if rec is not None: yield rec
+        elif ev is not None and ':' in line:
+            name, value = line.split(':', 1)
+            name, _, params = name.partition(';')
+            if name in ('DTSTART', 'DTEND'):
+                try: ev[name] = parse_ics_dt(value, params)
+                except ValueError: ev[name], ev['bad'] = None, True
+            elif name == 'SUMMARY': ev['text'] = ics_unescape(value)
+            elif name == 'X-TIMEDOTS-COLOR': ev['color'] = value
+
+EXPORT_WRITERS = {'ndjson': write_ndjson, 'csv': write_csv, 'ics': write_ics}
+IMPORT_READERS = {'ndjson': read_ndjson, 'csv': read_csv, 'ics': read_ics}
+
+def export_days(store, path, fmt=None):
+    # 返回导出的天数
+    fmt = guess_format(path, fmt)
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for _ in EXPORT_WRITERS[fmt](store.iter_days(), f):
+            count += 1
+    return count
+
+def clean_import_day(key, day):
+    # 校验并规整一条导入记录，格式不对时抛出 IMPORT_ERRORS 中的异常
+    datetime.strptime(key, "%Y-%m-%d")
+    segs = []
+    for s in day.get('segments', []):
+        start, end = int(s['start']), int(s['end'])
+        if end <= start: raise ValueError(f"empty segment {start}-{end}")
+        color = [int(c) for c in s.get('color', [255, 255, 255])][:3]
+        if len(color) != 3: raise ValueError(f"bad color {color}")
+        segs.append(dict(s, start=start, end=end, color=color, layer=int(s.get('layer', 0)), text=str(s.get('text', ""))))
+    notes = {}
+    for m, n in day.get('notes', {}).items():
+        color = [int(c) for c in n.get('color', [255, 80, 80])][:3]
+        if len(color) != 3: raise ValueError(f"bad color {color}")
+        notes[str(int(m))] = {'color': color, 'text': str(n.get('text', ""))}
+    return {'segments': segs, 'notes': notes}
+
+def iter_import(path, fmt, skipped):
+    # 逐条读取并校验导入文件，只产出规整后的非空日期
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for k, day in IMPORT_READERS[fmt](f, skipped):
+            try:
+                day = clean_import_day(k, day)
+            except IMPORT_ERRORS:
+                skipped.append(k)
+                continue
+            # 所有行都被跳过的日期不留空条目
+            if not is_empty_day(day): yield k, day
+
+def import_days(store, path, fmt=None):
+    # 两遍流式读取：第一遍只校验与计数，文件中途读不下去时存储保持不变；
+    # 第二遍重新打开文件，边读边逐天合并进存储 (时间块去重、备注覆盖)。两遍都不会把整个文件留在内存里。
+    # 格式错误的记录跳过并计数。只标记脏数据，由调用方统一保存一次。返回 (导入的天数, 跳过的记录数)
+    fmt = guess_format(path, fmt)
+    skipped = []
+    for _ in iter_import(path, fmt, skipped): pass
+    count = 0
+    for k, day in iter_import(path, fmt, []):
+        target = store.setdefault(k, {"segments": [], "notes": {}})
+        target['segments'].extend(day['segments'])
+        dedupe_segments(target)
+        target['notes'].update(day['notes'])
+        store.mark_dirty(k)
+        count += 1
+    return count, len(skipped)
+
+def run_cli(argv):
+    # 命令行导入/导出，不启动界面：python timedot_nnlv.py --export history.csv
+    parser = argparse.ArgumentParser(prog='timedot_nnlv.py')
+    parser.add_argument('--export', metavar='PATH', help="导出全部数据")
+    parser.add_argument('--import', dest='import_path', metavar='PATH', help="导入数据")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, help="默认按扩展名判断")
+    args, _ = parser.parse_known_args(argv)
+    if not args.export and not args.import_path: return False
+    d = {}
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, 'r') as f: d = json.load(f)
+    store, _ = open_day_store(d)
+    try:
+        if args.import_path:
+            n, bad = import_days(store, args.import_path, args.format)
+            for job, _ in store.take_dirty_jobs(): job()
+            print(f"Imported {n} day records from {args.import_path}" + (f", skipped {bad} malformed records" if bad else ""))
+        if args.export:
+            n = export_days(store, args.export, args.format)
+            print(f"Exported {n} days to {args.export}")
+    except (OSError, *IMPORT_ERRORS) as e:
+        # 文件无法读取 / 缺少必要的列等：给出一行错误信息并以非零状态退出，而不是打印调用栈
+        print(f"{'Import' if args.import_path else 'Export'} failed: {type(e).__name__}: {e}", file=sys.stderr)
+        sys.exit(1)
+    return True
+
+# --- 撤销 / 重做 ---
+class EditJournal:
+    # 有内存上限的撤销/重做栈。每条记录只保存一个可逆的小操作 (涉及的日期、
+    # 时间块对象或备注的新旧值)，而不是整份 data_store 的拷贝
+    #   seg_add:  {'date', 'seg'}
+    #   seg_del:  {'date', 'seg', 'index'}
+    #   seg_edit: {'date', 'seg', 'old', 'new'}     old/new 为 {'color', 'text'}
+    #   note:     {'date', 'key', 'old', 'new'}     old/new 为 None 表示不存在
+    def __init__(self, limit_bytes):
+        self.limit_bytes = limit_bytes
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.size = 0
+
+    @staticmethod
+    def op_size(op):
+        return len(json.dumps(op, default=str))
+
+    def record(self, kind, **op):
+        op['kind'] = kind
+        op['_size'] = self.op_size(op)
+        self.undo_stack.append(op)
+        self.size += op['_size']
+        self.redo_stack.clear()
+        # 超出上限时从最旧的记录开始丢弃
+        while self.size > self.limit_bytes and len(self.undo_stack) > 1:
+            self.size -= self.undo_stack.popleft()['_size']
+
+    def pop_undo(self):
+        if not self.undo_stack: return None
+        op = self.undo_stack.pop()
+        self.size -= op['_size']
+        self.redo_stack.append(op)
+        return op
+
+    def pop_redo(self):
+        if not self.redo_stack: return None
+        op = self.redo_stack.pop()
+        self.undo_stack.append(op)
+        self.size += op['_size']
+        return op
+
+def remove_segment(segs, seg):
+    # 优先按对象身份删除，找不到时 (例如数据被重新加载过) 退回按内容匹配
+    for i, s in enumerate(segs):
+        if s is seg:
+            del segs[i]
+            return i
+    if seg in segs:
+        i = segs.index(seg)
+        del segs[i]
+        return i
+    return -1
+
+# --- 提醒调度 ---
+class AlarmScheduler:
+    # 今天所有未到期提醒的最小堆：(分钟, 类型)，类型为 'timer' (时间块结束) 或 'note'。
+    # 删除采用惰性方式：count 记录每个 (分钟, 类型) 仍然有效的次数，出堆时跳过已失效的条目
+    def __init__(self, grace_s):
+        self.grace_s = grace_s
+        self.date_key = None
+        self.base = None
+        self.heap = []
+        self.count = {}
+
+    def reset(self, day_date, day):
+        # 只登记尚未到期的提醒；启动或跨天时，之前的时间点不算 "错过"
+        self.date_key = day_date.isoformat()
+        self.base = datetime.combine(day_date, time(0, 0))
+        self.heap = []
+        self.count = {}
+        for s in day['segments']: self.add(int(s['end']), 'timer')
+        for k in day['notes']: self.add(int(k), 'note')
+
+    def when(self, minute):
+        return self.base + timedelta(minutes=minute)
+
+    def add(self, minute, kind):
+        if self.base is None or self.when(minute) <= datetime.now(): return
+        key = (minute, kind)
+        n = self.count.get(key, 0)
+        self.count[key] = n + 1
+        if n == 0: heapq.heappush(self.heap, key)
+
+    def remove(self, minute, kind):
+        key = (minute, kind)
+        if self.count.get(key, 0) > 0: self.count[key] -= 1
+
+    def next_deadline(self):
+        while self.heap and not self.count.get(self.heap[0]):
+            heapq.heappop(self.heap)
+        return self.when(self.heap[0][0]) if self.heap else None
+
+    def pop_due(self, now):
+        # 弹出所有已到期的提醒。宽限时间内的按类型合并 (每种声音只响一次)，更早的视为过期丢弃
+        due, stale = set(), 0
+        while self.heap and self.when(self.heap[0][0]) <= now:
+            key = heapq.heappop(self.heap)
+            if not self.count.get(key): continue
+            self.count[key] = 0
+            if (now - self.when(key[0])).total_seconds() <= self.grace_s: due.add(key[1])
+            else: stale += 1
+        return due, stale
+
+# --- 点阵几何表 ---
+class DotGeometry:
+    # 行中心 Y 与列中心 X 的前缀和表，查询一个圆点的位置是 O(1)。
+    # 只在配置、行高或 hover/header 动画值、内容区域位置变化时重建
+    def __init__(self, row_heights, cols, left, top, rad, sp, col_unit, gap_per_col):
+        # gap_per_col[c]：第 c 列左侧新出现的缝隙宽度 (0 表示没有缝隙)
+        row_steps = [h + sp for h in row_heights]
+        if HAS_NUMPY:
+            self.row_y = top + rad + np.concatenate(([0.0], np.cumsum(row_steps[:-1], dtype=float)))
+            self.col_x = left + rad + np.arange(cols, dtype=float) * col_unit + np.cumsum(gap_per_col, dtype=float)
+        else:
+            self.row_y = array('d', (top + rad + y for y in accumulate(row_steps[:-1], initial=0.0)))
+            self.col_x = array('d', (left + rad + c * col_unit + g for c, g in enumerate(accumulate(gap_per_col))))
+        # 命中测试用的有序边界：每行占据 [row_top[r], row_top[r] + row_steps[r])，连续无缝
+        self.row_top = [float(y) - rad for y in self.row_y]
+        self.row_steps = row_steps
+        self.col_list = [float(x) for x in self.col_x]
+
+    def pos(self, r, c):
+        return QPointF(float(self.col_x[c]), float(self.row_y[r]))
+
+    def row_at(self, y):
+        r = bisect_right(self.row_top, y) - 1
+        if r < 0 or r >= len(self.row_steps) or y >= self.row_top[r] + self.row_steps[r]: return -1
+        return r
+
+    def col_at(self, x, tol):
+        # 离 x 最近的列中心，超出容差返回 -1
+        cols = self.col_list
+        c = bisect_left(cols, x)
+        best = -1
+        for i in (c - 1, c):
+            if 0 <= i < len(cols) and abs(cols[i] - x) <= tol and (best == -1 or abs(cols[i] - x) < abs(cols[best] - x)):
+                best = i
+        return best
+
+# --- 时间块分层索引 ---
+class SegmentIndex:
+    # 按开始时间排序的区间索引。分层规则与原来的贪心首次适配一致：
+    # 按开始时间依次放入最低的空闲层。互不重叠的 "簇" 之间分层互不影响，
+    # 因此插入 / 删除 / 拉伸时只需重排受影响的那一簇，并只重算它覆盖到的行
+    def __init__(self, segs, base, rd, rows):
+        self.base, self.rd, self.rows = base, rd, rows
+        self.segs = sorted(segs, key=lambda x: x['start'])
+        self.starts = [x['start'] for x in self.segs]
+        # 最长时间块的长度：查询与 [a, b) 重叠的块只需看 start >= a - max_len 的部分
+        self.max_len = max((x['end'] - x['start'] for x in self.segs), default=0)
+        self.row_max = [-1] * rows
+        self._relayer(0, len(self.segs))
+        self._refresh_rows(0, rows)
+
+    def _relayer(self, lo, hi):
+        layers_end = []
+        for s in self.segs[lo:hi]:
+            for i, end in enumerate(layers_end):
+                if end <= s['start']:
+                    layers_end[i] = s['end']
+                    s['layer'] = i
+                    break
+            else:
+                s['layer'] = len(layers_end)
+                layers_end.append(s['end'])
+
+    def _cluster(self, a, b):
+        # 与 [a, b) 相连的所有簇在排序列表中的范围 [lo, hi)
+        starts, segs = self.starts, self.segs
+        lo = bisect_left(starts, a)
+        reach = a
+        while True:
+            first = bisect_left(starts, reach - self.max_len)
+            j = next((i for i in range(first, lo) if segs[i]['end'] > reach), None)
+            if j is None: break
+            lo, reach = j, starts[j]
+        hi, m = lo, b
+        while hi < len(segs) and starts[hi] < m:
+            m = max(m, segs[hi]['end'])
+            hi += 1
+        return lo, hi, reach, m
+
+    def _refresh_rows(self, r0, r1):
+        starts, segs = self.starts, self.segs
+        for r in range(max(0, r0), min(self.rows, r1)):
+            rs = self.base + r * self.rd; re = rs + self.rd
+            best = -1
+            for i in range(bisect_left(starts, rs - self.max_len), bisect_left(starts, re)):
+                if segs[i]['end'] > rs: best = max(best, segs[i].get('layer', 0))
+            self.row_max[r] = best
+
+    def _update(self, a, b):
+        lo, hi, a, b = self._cluster(a, b)
+        self._relayer(lo, hi)
+        self._refresh_rows((a - self.base) // self.rd, (b - self.base - 1) // self.rd + 1)
+
+    def insert(self, seg):
+        i = bisect_right(self.starts, seg['start'])
+        self.segs.insert(i, seg)
+        self.starts.insert(i, seg['start'])
+        self.max_len = max(self.max_len, seg['end'] - seg['start'])
+        self._update(seg['start'], seg['end'])
+
+    def remove(self, seg):
+        lo = bisect_left(self.starts, seg['start'])
+        hi = bisect_right(self.starts, seg['start'])
+        for i in range(lo, hi):
+            if self.segs[i] is seg:
+                del self.segs[i]
+                del self.starts[i]
+                # max_len 只作为上界使用，删除时不必收缩
+                self._update(seg['start'], seg['end'])
+                return True
+        return False
+
+    def resize(self, seg, start, end):
+        self.remove(seg)
+        seg['start'], seg['end'] = start, end
+        self.insert(seg)
+
+# --- 周 / 月 / 年 概览 ---
+VIEW_MODES = ('day', 'week', 'month', 'year')
+VIEW_NAMES = {'day': "日", 'week': "周", 'month': "月", 'year': "年"}
+# 每种概览的单元格 (宽, 高, 间距)：周视图每天一根竖条，月视图日历格，年视图按周排列的小方格
+OVERVIEW_CELL = {'week': (30, 150, 8), 'month': (30, 30, 4), 'year': (11, 11, 2)}
+OVERVIEW_LABEL_H = 16  # 网格上方的星期 / 月份标签
+
+# minutes: 时间块覆盖的分钟数 (重叠只算一次)；spans: 合并后的覆盖区间；color: 覆盖时长最多的颜色
+DaySummary = namedtuple('DaySummary', 'minutes segments notes color spans')
+EMPTY_SUMMARY = DaySummary(0, 0, 0, None, ())
+
+def summarize_day(day):
+    segs = day.get('segments', ())
+    merged = []
+    for a, b in sorted((int(s['start']), int(s['end'])) for s in segs if s['end'] > s['start']):
+        if merged and a <= merged[-1][1]: merged[-1][1] = max(merged[-1][1], b)
+        else: merged.append([a, b])
+    weight = {}
+    for s in segs:
+        c = tuple(s.get('color', (255, 255, 255))[:3])
+        weight[c] = weight.get(c, 0) + max(0, s['end'] - s['start'])
+    return DaySummary(sum(b - a for a, b in merged), len(segs), len(day.get('notes', ())),
+                      max(weight, key=weight.get) if weight else None, tuple((a, b) for a, b in merged))
+
+class DaySummaries:
+    # 每日汇总缓存：概览视图绘制时只读这里，不再逐次遍历 data_store。
+    # 某天被修改 (save_day) 或被外部改动时只让那一天失效，下次用到时单独重算
+    def __init__(self):
+        self.cache = {}
+        self.computed = 0
+        self.version = 0
+
+    def get(self, store, key):
+        s = self.cache.get(key)
+        if s is None:
+            day = store.get(key)
+            s = self.cache[key] = summarize_day(day) if day else EMPTY_SUMMARY
+            self.computed += 1
+        return s
+
+    def invalidate(self, keys=None):
+        self.version += 1
+        if keys is None: self.cache.clear()
+        else:
+            for k in keys: self.cache.pop(k, None)
+
+def overview_period(mode, d):
+    # 返回 (周期首日, 周期末日, 网格起点 (周一), 列数, 行数)
+    if mode == 'week':
+        start = d.addDays(1 - d.dayOfWeek())
+        return start, start.addDays(6), start, 7, 1
+    if mode == 'month':
+        first = QDate(d.year(), d.month(), 1)
+        return first, first.addDays(first.daysInMonth() - 1), first.addDays(1 - first.dayOfWeek()), 7, 6
+    first, last = QDate(d.year(), 1, 1), QDate(d.year(), 12, 31)
+    grid_start = first.addDays(1 - first.dayOfWeek())
+    return first, last, grid_start, math.ceil((grid_start.daysTo(last) + 1) / 7), 7
+
+class OverviewGrid:
+    # 概览视图的规则网格：日期与单元格位置互相换算都是 O(1)。年视图按列 (周) 排，其余按行 (周) 排
+    def __init__(self, mode, d, left=0.0, top=0.0):
+        self.mode = mode
+        self.first, self.last, self.grid_start, self.cols, self.rows = overview_period(mode, d)
+        self.cw, self.ch, self.gap = OVERVIEW_CELL[mode]
+        self.left = left
+        self.top = top + OVERVIEW_LABEL_H
+        self.column_major = mode == 'year'
+
+    def size(self):
+        return (self.cols * self.cw + (self.cols - 1) * self.gap,
+                OVERVIEW_LABEL_H + self.rows * self.ch + (self.rows - 1) * self.gap)
+
+    def cell(self, d):
+        i = self.grid_start.daysTo(d)
+        if self.column_major: c, r = divmod(i, 7)
+        else: r, c = divmod(i, 7)
+        return c, r
+
+    def rect(self, d):
+        c, r = self.cell(d)
+        return QRectF(self.left + c * (self.cw + self.gap), self.top + r * (self.ch + self.gap), self.cw, self.ch)
+
+    def date_at(self, x, y):
+        c, cx = divmod(x - self.left, self.cw + self.gap)
+        r, cy = divmod(y - self.top, self.ch + self.gap)
+        if not (0 <= c < self.cols and 0 <= r < self.rows) or cx > self.cw or cy > self.ch: return None
+        c, r = int(c), int(r)
+        d = self.grid_start.addDays(c * 7 + r if self.column_major else r * 7 + c)
+        return d if self.first <= d <= self.last else None
+
+    def days(self):
+        d = self.first
+        while d <= self.last:
+            yield d
+            d = d.addDays(1)
+
+# --- 锁定模式悬停探测 ---
+class LockedHoverProbe:
+    # 锁定 (鼠标穿透) 时窗口收不到鼠标事件，只能主动读取光标位置。
+    # 以较低频率探测，用单调时钟计算停留时长 (不受探测间隔或卡顿影响)，
+    # 只在浮现状态或穿透状态真正变化时才通知窗口
+    def __init__(self, widget, interval_ms, reveal_ms=LOCK_REVEAL_MS):
+        self.widget = widget
+        self.reveal_ms = reveal_ms
+        self.enter_t = None
+        self.timer = QTimer(widget)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.probe)
+
+    def start(self):
+        if not self.timer.isActive():
+            self.enter_t = None
+            self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+        self.enter_t = None
+
+    def probe(self):
+        w = self.widget
+        if not w.is_locked or not w.isVisible():
+            self.stop()
+            return
+        local = QPointF(w.mapFromGlobal(QCursor.pos()))
+        visible = False
+        if QRectF(w.current_content_rect).contains(local):
+            now = monotonic()
+            if self.enter_t is None: self.enter_t = now
+            visible = (now - self.enter_t) * 1000 >= self.reveal_ms
+        else:
+            self.enter_t = None
+        # 浮现后只有光标停在红绿灯上时才接收鼠标，其余时候保持穿透
+        over_lights = visible and w.header_rect().adjusted(-3, -3, 3, 3).contains(local)
+        w.set_locked_state(visible, click_through=not over_lights)
+
+# --- 性能监测 (可选) ---
+# 设置环境变量 TIMEDOTS_PROFILE=1 或在托盘菜单中开启；关闭时各处只多一次 None 判断
+PERF_ENV = 'TIMEDOTS_PROFILE'
+PERF_RING = 600        # 每项指标保留的最近样本数
+PERF_REFRESH_MS = 500  # 浮层刷新间隔
+PERF_BUCKETS_MS = (0.25, 0.5, 1, 2, 4, 8, 16, 33, 66, 133, 266)
+
+class PerfStats:
+    # 每项指标一个定长环形缓冲 (毫秒)，外加累计次数。保存线程也会写入，deque 的 append 是线程安全的
+    def __init__(self, size=PERF_RING):
+        self.size = size
+        self.samples = {}
+        self.counters = {}
+        self.started = monotonic()
+
+    def record(self, name, ms):
+        q = self.samples.get(name)
+        if q is None: q = self.samples.setdefault(name, deque(maxlen=self.size))
+        q.append(ms)
+        self.count(name)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def percentiles(self, name, ps=(50, 99)):
+        vals = sorted(self.samples.get(name, ()))
+        if not vals: return [None] * len(ps)
+        return [vals[min(len(vals) - 1, round(p / 100 * (len(vals) - 1)))] for p in ps]
+
+    def histogram(self, name):
+        vals = list(self.samples.get(name, ()))
+        counts = [0] * (len(PERF_BUCKETS_MS) + 1)
+        for v in vals: counts[bisect_left(PERF_BUCKETS_MS, v)] += 1
+        p50, p90, p99 = self.percentiles(name, (50, 90, 99))
+        return {'total': self.counters.get(name, 0), 'window': len(vals),
+                'p50': p50, 'p90': p90, 'p99': p99, 'max': max(vals, default=None),
+                'mean': sum(vals) / len(vals) if vals else None,
+                'bucket_upper_ms': list(PERF_BUCKETS_MS) + [None], 'counts': counts}
+
+    def snapshot(self):
+        return {'uptime_s': round(monotonic() - self.started, 1),
+                'counters': dict(self.counters),
+                'metrics': {name: self.histogram(name) for name in sorted(self.samples)}}
+
+def perf_timed(name):
+    # 方法计时：只在 self.perf 开启时记录耗时
+    def wrap(fn):
+        def timed(self, *args, **kwargs):
+            perf = self.perf
+            if perf is None: return fn(self, *args, **kwargs)
+            t = perf_counter()
+            try: return fn(self, *args, **kwargs)
+            finally: perf.record(name, (perf_counter() - t) * 1000)
+        return timed
+    return wrap
+
+class PerfOverlay(QWidget):
+    # 独立的小浮窗，贴在主窗口上方：不参与主窗口的重绘与遮罩，因此不会干扰被测的帧
+    def __init__(self, host):
+        super().__init__(None)
+        self.setWindowFlags(Qt.WindowType.ToolTip | Qt.WindowType.FramelessWindowHint | Qt.WindowType.NoDropShadowWindowHint)
+        self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
+        self.setAttribute(Qt.WidgetAttribute.WA_ShowWithoutActivating)
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.host = host
+        self.font = QFont("Consolas", 9)
+        self.lines = []
+        self.last_layout = host.layout_work
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(PERF_REFRESH_MS)
+
+    def refresh(self):
+        w, perf = self.host, self.host.perf
+        if perf is None: return
+        # 布局重算次数 (layout_work 增量) 按刷新周期采样
+        layout_rate = (w.layout_work - self.last_layout) * 1000 / PERF_REFRESH_MS
+        perf.record('layout_per_s', layout_rate)
+        self.last_layout = w.layout_work
+        def fmt(name, label):
+            p50, p99 = perf.percentiles(name)
+            if p50 is None: return f"{label:6s} -"
+            return f"{label:6s} p50 {p50:6.2f}  p99 {p99:6.2f} ms"
+        rate = w.native_update_rate()
+        self.lines = [fmt('paint', 'frame'), fmt('loop', 'loop'), fmt('hit_idx', 'hit'),
+                      fmt('hit_seg', 'seg'), fmt('save_latency', 'save'),
+                      f"layout {layout_rate:.0f}/s  mask {rate['mask']}/min  flags {rate['flags']}/min"]
+        fm = QFontMetrics(self.font)
+        self.resize(max(fm.horizontalAdvance(l) for l in self.lines) + 16, fm.height() * len(self.lines) + 12)
+        anchor = w.mapToGlobal(w.current_content_rect.topLeft())
+        y = anchor.y() - self.height() - 4
+        if y < w.screen().availableGeometry().top(): y = w.mapToGlobal(w.current_content_rect.bottomLeft()).y() + 4
+        self.move(anchor.x(), y)
+        if w.isVisible() and not self.isVisible(): self.show()
+        elif not w.isVisible() and self.isVisible(): self.hide()
+        self.update()
+
+    def paintEvent(self, event):
+        pt = QPainter(self)
+        pt.setRenderHint(QPainter.RenderHint.Antialiasing)
+        pt.setBrush(QBrush(QColor(20, 20, 20, 210)))
+        pt.setPen(Qt.PenStyle.NoPen)
+        pt.drawRoundedRect(QRectF(self.rect()), 6, 6)
+        pt.setFont(self.font)
+        pt.setPen(QColor(220, 220, 220))
+        fm = QFontMetrics(self.font)
+        for i, line in enumerate(self.lines):
+            pt.drawText(8, 6 + fm.ascent() + i * fm.height(), line)
+
 class InteractionState:
     Idle = 0
     CreatingSegment = 1 
@@ -104,18 +1466,135 @@ GLOBAL_STYLESHEET = """
     QMenu::separator { height: 1px; background: #555; margin: 4px 0; }
 """
 
-def play_sound_by_type(sound_type):
-    if not HAS_SOUND or sound_type == SoundType.Mute: return
-    def _play_worker():
-        try:
-            if IS_WINDOWS:
-                if sound_type == SoundType.Beep: winsound.Beep(800, 150)
-                elif sound_type == SoundType.Chime: 
-                    winsound.Beep(1200, 100); winsound.Beep(1600, 300)
-                elif sound_type == SoundType.Alert:
-                    for i in range(3): winsound.Beep(1000, 100)
-        except: pass
-    threading.Thread(target=_play_worker, daemon=True).start()
+# --- 声音 ---
+# 提示音在常驻工作线程里预先合成为 PCM，再交给可替换的输出端 (sink) 播放
+SAMPLE_RATE = 22050
+SOUND_BACKENDS = ('auto', 'winsound', 'paplay', 'aplay', 'wav', 'null')
+
+# (频率 Hz, 时长 ms)，频率为 0 表示静音间隔
+TONE_PATTERNS = {
+    SoundType.Beep: [(800, 150)],
+    SoundType.Chime: [(1200, 100), (1600, 300)],
+    SoundType.Alert: [(1000, 100), (0, 40), (1000, 100), (0, 40), (1000, 100)],
+}
+
+def render_tone(pattern, rate=SAMPLE_RATE, volume=0.35):
+    # 16 位单声道正弦波，每段首尾 5ms 线性淡入淡出，避免爆音
+    pcm = array('h')
+    amp = volume * 32767
+    for freq, ms in pattern:
+        n = rate * ms // 1000
+        if not freq:
+            pcm.extend([0] * n)
+            continue
+        fade = max(1, min(n // 2, rate * 5 // 1000))
+        w = 2 * math.pi * freq / rate
+        pcm.extend(int(amp * min(1.0, i / fade, (n - 1 - i) / fade) * math.sin(w * i)) for i in range(n))
+    return pcm
+
+def wav_bytes(pcm, rate=SAMPLE_RATE):
+    if sys.byteorder == 'big':
+        pcm = array('h', pcm); pcm.byteswap()
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as f:
+        f.setnchannels(1); f.setsampwidth(2); f.setframerate(rate)
+        f.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+class WinSoundSink:
+    name = 'winsound'
+    def play(self, kind, wav):
+        winsound.PlaySound(wav, winsound.SND_MEMORY)
+
+class CommandSink:
+    # PulseAudio (paplay) / ALSA (aplay)：WAV 数据从标准输入送入播放进程
+    def __init__(self, name, argv):
+        self.name = name
+        self.argv = argv
+
+    def play(self, kind, wav):
+        subprocess.run(self.argv, input=wav, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=10)
+
+class WavSink:
+    # 写出 WAV 文件 (directory 为 None 时只记录，不落盘)，用于测试或无声环境
+    def __init__(self, directory=None):
+        self.name = 'wav' if directory else 'null'
+        self.directory = directory
+        self.played = []
+
+    def play(self, kind, wav):
+        self.played.append(kind)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{len(self.played):04d}_{SOUND_NAMES[kind].split('(')[-1].rstrip(')').lower()}.wav")
+            with open(path, 'wb') as f: f.write(wav)
+
+def make_sound_sink(backend='auto'):
+    if backend not in SOUND_BACKENDS: backend = 'auto'
+    if backend in ('auto', 'winsound') and HAS_WINSOUND: return WinSoundSink()
+    if backend in ('auto', 'paplay') and shutil.which('paplay'): return CommandSink('paplay', ['paplay'])
+    if backend in ('auto', 'aplay') and shutil.which('aplay'): return CommandSink('aplay', ['aplay', '-q', '-'])
+    if backend == 'wav': return WavSink(os.path.join(os.path.dirname(CONFIG_FILE), 'sounds'))
+    return WavSink()
+
+class SoundService:
+    # 单个常驻播放线程 + 有界队列。GUI 线程只投递类型；同一提示音在排队或播放中时再次触发会被合并
+    def __init__(self, sink, maxsize=4):
+        self.sink = sink
+        self.clips = {}
+        self.queue = queue.Queue(maxsize)
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def play(self, sound_type):
+        if sound_type not in TONE_PATTERNS: return False
+        with self.lock:
+            if sound_type in self.pending: return False
+            try: self.queue.put_nowait(sound_type)
+            except queue.Full: return False
+            self.pending.add(sound_type)
+        return True
+
+    def warm(self):
+        # 在工作线程里预先合成全部提示音 (启动首帧之后调用，避免与首帧争抢 GIL)
+        try: self.queue.put_nowait(None)
+        except queue.Full: pass
+
+    def clip(self, kind):
+        c = self.clips.get(kind)
+        if c is None: c = self.clips[kind] = wav_bytes(render_tone(TONE_PATTERNS[kind]))
+        return c
+
+    def _run(self):
+        while True:
+            kind = self.queue.get()
+            try:
+                if kind is None:
+                    for k in TONE_PATTERNS: self.clip(k)
+                else: self.sink.play(kind, self.clip(kind))
+            except Exception as e: print(f"Sound error: {e}")
+            finally:
+                with self.lock: self.pending.discard(kind)
+                self.queue.task_done()
+
+_tray_icon = None
+
+def tray_icon():
+    # 托盘图标只在第一次需要时画一次，之后复用
+    global _tray_icon
+    if _tray_icon is None:
+        px = QPixmap(32, 32)
+        px.fill(Qt.GlobalColor.transparent)
+        pt = QPainter(px)
+        pt.setRenderHint(QPainter.RenderHint.Antialiasing)
+        pt.setBrush(QBrush(QColor(200, 60, 60)))
+        pt.setPen(Qt.PenStyle.NoPen)
+        pt.drawEllipse(6, 6, 20, 20)
+        pt.end()
+        _tray_icon = QIcon(px)
+    return _tray_icon
 
 class OverlayTooltip(QWidget):
     def __init__(self, text, parent=None):
@@ -790,8 +2269,7 @@ class SettingsDialog(QDialog):
         self.settings['sound_timer'] = self.sound_timer.currentIndex()
         self.settings['sound_note'] = self.sound_note.currentIndex()
         
-        self.main_window.force_refresh_max_geometry() 
-        self.main_window.update()
+        self.main_window.apply_config_change()
 
     def save_and_close(self):
         self.main_window.save_config()
@@ -801,8 +2279,7 @@ class SettingsDialog(QDialog):
         curr_pos = self.main_window.pos()
         self.original_config['window_pos'] = [curr_pos.x(), curr_pos.y()]
         self.main_window.config.update(self.original_config)
-        self.main_window.force_refresh_max_geometry() 
-        self.main_window.update()
+        self.main_window.apply_config_change()
         self.reject()
 
 class TimeDotsWidget(QWidget):
@@ -831,12 +2308,24 @@ class TimeDotsWidget(QWidget):
             'sidebar_always_on': False,
             'sound_timer': 2,
             'sound_note': 1,
+            'storage_backend': 'json',
+            'compact_on_startup': False,
+            'undo_limit_kb': 256,
+            'alarm_grace_min': 5,
+            'lock_probe_ms': 100,
+            'sound_backend': 'auto',
+            'schema_version': SCHEMA_VERSION,
             # [新增] 时间块布局参数
             'seg_base_offset': 6,    # A: 圆点到底部第一层的距离
             'seg_layer_step': 12,    # B: 层级之间的间距
             'seg_bottom_margin': 8   # C: 最后一层到下一行的距离
         }
-        self.data_store = {} 
+        self.data_store = ShardedDayStore(get_data_dir())
+        self.schema_migrated = False
+        self._last_settings_dump = None
+        self.persistence = PersistenceService(self.collect_persist_jobs, self.on_save_error)
+        self.perf = None
+        self.perf_overlay = None
         self.current_view_date = QDate.currentDate()
         self.last_date_check = QDate.currentDate()
         
@@ -849,8 +2338,13 @@ class TimeDotsWidget(QWidget):
         
         self.is_locked = False
         self.controls_visible = False 
-        self.hover_time_acc = 0       
-        self.last_sound_min = -1 
+        self._click_through = False
+        self._reflagging = False
+        # 遮罩缓存 (None 表示已清除) 与原生更新计数，见 update_mask / native_update_rate
+        self._mask_rect = None
+        self.native_updates = {'mask': deque(), 'flags': deque()}
+        self.alarms = AlarmScheduler(self.config['alarm_grace_min'] * 60)
+        self.sound = SoundService(make_sound_sink(self.config['sound_backend']))
         
         self.state = InteractionState.Idle
         self.window_start_pos = None
@@ -863,6 +2357,9 @@ class TimeDotsWidget(QWidget):
         self.hovered_light_idx = -1
         self.hovered_date = None 
         self.hovered_arrow = None 
+        self.hovered_info = False
+        self.hovered_cell = None
+        self._last_tick_mins = None
         
         self.preview_segment = None 
         self.current_popup = None 
@@ -874,25 +2371,89 @@ class TimeDotsWidget(QWidget):
         self.cal_anim.setEasingCurve(QEasingCurve.Type.OutQuad) 
         self.cal_anim.valueChanged.connect(self.update_cal_anim_val)
 
+        # 布局引擎的版本号：配置、当天时间块数据、预览时间块。
+        # layout_work 统计真正执行的布局计算次数，稳定帧应当为 0
+        self.config_version = 0
+        self.data_version = 0
+        self.preview_version = 0
+        self.layout_work = 0
+        # 视图模式：day 为点阵，week / month / year 为概览，见 set_view_mode
+        self.view_mode = 'day'
+        self.summaries = DaySummaries()
+        self._overview_grid = None
+        self._overview_key = None
+        self._layout_key = None
+        self._ideal_dims = {}
+        self._seg_index = None
+        self._seg_index_key = None
+        self._dot_points_geo = None
+        self._color_cache = {}
+        
         self.cached_row_heights = {} 
+        self.row_heights_version = 0
+        self._geometry = None
+        self._geometry_key = None
+        self._hit_geo = None
+        self._hit_key = None
+        self._hit_rows = {}
         self.update_grid_cache()
         
+        # 静态层 (背景、时间刻度) 缓存，见 get_static_layer
+        self._static_layer = None
+        self._static_layer_key = None
+        # 概览视图的网格层与周期合计，见 get_overview_layer
+        self._overview_layer = None
+        self._overview_layer_key = None
+        self._overview_totals = (0, 0)
+        self._overview_totals_key = None
+        
         self.max_dims = (100, 100) 
         self.current_content_rect = QRect()
         
         self.tooltip_timer = QTimer(self)
         self.tooltip_timer.setSingleShot(True)
         self.tooltip_timer.timeout.connect(self.show_hover_tooltip)
+        
+        # 鼠标移动合并到帧率，见 mouseMoveEvent / flush_pointer
+        self.move_timer = QTimer(self)
+        self.move_timer.setSingleShot(True)
+        self.move_timer.timeout.connect(self.flush_pointer)
+        self._pending_move = None
+        self._last_move_t = 0.0
         self.last_hovered_obj = None 
 
         self.arrow_rects = {} 
 
+        self.journal = EditJournal(self.config['undo_limit_kb'] * 1024)
+        # 启动只加载今天所在的月份 (首次读取时按需加载)；托盘与日历条的月份预取在首帧之后进行，见 finish_startup
+        self.tray = None
+        self.first_frame_at = None
+        self.startup_done = False
+        self.store_watcher = StoreWatcher(lambda: self.data_store, self.on_store_changed_externally)
         self.init_ui()
-        self.init_tray()
+        # TIMEDOTS_PROFILE=1 启动即开启性能监测；值为 *.json 路径时退出前把数据导出到该文件
+        if os.environ.get(PERF_ENV, '') not in ('', '0'): self.set_profiling(True)
+        # 旧版 config.json 迁移后立即落盘，把 data_store 从设置文件里移除
+        if self.data_store.has_dirty() or self.schema_migrated:
+            self.save_config()
         
+        # 帧定时器只在动画进行时运行，插值收敛后自行停下；
+        # 锁定时由低频探测器检查鼠标；分钟时钟负责提醒、日期变更与 "当前" 圆点
         self.timer = QTimer(self)
+        self.timer.setInterval(FRAME_MS)
         self.timer.timeout.connect(self.loop)
-        self.timer.start(16) 
+        self.lock_probe = LockedHoverProbe(self, self.config['lock_probe_ms'])
+        self.clock_timer = QTimer(self)
+        self.clock_timer.setSingleShot(True)
+        self.clock_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.clock_timer.timeout.connect(self.on_clock_tick)
+        self.alarm_timer = QTimer(self)
+        self.alarm_timer.setSingleShot(True)
+        self.alarm_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.alarm_timer.timeout.connect(self.check_alarms)
+        self.reset_alarms()
+        self.on_clock_tick()
+        self.kick_animation()
 
     def update_cal_anim_val(self, val):
         self.cal_anim_val = val
@@ -906,9 +2467,69 @@ class TimeDotsWidget(QWidget):
         self.cal_anim.setStartValue(start_val)
         self.cal_anim.setEndValue(0.0)
         self.cal_anim.start()
+        self.preload_visible_months()
         self.force_refresh_max_geometry()
         self.update()
 
+    def set_view_mode(self, mode, date=None):
+        # 切换 日 / 周 / 月 / 年 视图；从概览点进某一天时同时跳到该日期
+        if mode not in VIEW_MODES: return
+        if date is not None: self.current_view_date = date
+        if self.tray is not None: self.view_actions[mode].setChecked(True)
+        if mode == self.view_mode and date is None: return
+        self.view_mode = mode
+        self.hovered_dot_idx = -1
+        self.hovered_segment = None
+        self.hovered_date = None
+        self.hovered_arrow = None
+        self.hovered_cell = None
+        self.arrow_rects = {}
+        self.preload_visible_months()
+        self.force_refresh_max_geometry()
+        self.update()
+
+    def zoom_view(self, steps):
+        # 正数缩小 (日 -> 周 -> 月 -> 年)，负数放大
+        i = min(len(VIEW_MODES) - 1, max(0, VIEW_MODES.index(self.view_mode) + steps))
+        self.set_view_mode(VIEW_MODES[i])
+
+    def scroll_period(self, steps):
+        d = self.current_view_date
+        if self.view_mode == 'week': d = d.addDays(7 * steps)
+        elif self.view_mode == 'month': d = d.addMonths(steps)
+        else: d = d.addYears(steps)
+        self.current_view_date = d
+        self.hovered_cell = None
+        self.preload_visible_months()
+        self.force_refresh_max_geometry()
+        self.update()
+
+    def apply_config_change(self):
+        # 配置被修改：使依赖配置的缓存失效，并重新布局
+        self.config_version += 1
+        self.force_refresh_max_geometry()
+        self.kick_animation()
+        self.update()
+
+    def preload_visible_months(self):
+        # 只加载当前视图与日历条 (前后各 7 天) 覆盖到的月份分片；概览加载整个周期
+        if self.view_mode == 'day':
+            self.data_store.ensure_range(self.current_view_date.addDays(-7), self.current_view_date.addDays(7))
+        else:
+            first, last = overview_period(self.view_mode, self.current_view_date)[:2]
+            self.data_store.ensure_range(first, last)
+        if hasattr(self, 'store_watcher'): self.store_watcher.refresh_paths()
+
+    def on_store_changed_externally(self, changed_keys):
+        if self.alarms.date_key in changed_keys: self.reset_alarms()
+        self.summaries.invalidate(changed_keys)
+        # 外部修改已逐天合并进内存，只有当前视图的日期需要重新布局
+        if self.current_view_key() in changed_keys:
+            self.hovered_segment = None
+            self.reset_segment_index()
+            self.force_refresh_max_geometry()
+        self.update()
+
     def init_ui(self):
         self.setWindowTitle('Time Dots')
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint | Qt.WindowType.Tool)
@@ -929,24 +2550,46 @@ class TimeDotsWidget(QWidget):
         self.move(move_to_pos)
         self.force_refresh_max_geometry()
 
+    def finish_startup(self):
+        # 首帧之后：托盘、日历条可见范围的月份、提示音合成、启动时整理
+        if self.startup_done: return
+        self.startup_done = True
+        self.init_tray()
+        self.preload_visible_months()
+        self.sound.warm()
+        if self.config['compact_on_startup']: self.compact_store()
+
     def init_tray(self):
         self.tray = QSystemTrayIcon(self)
-        px = QPixmap(32, 32)
-        px.fill(Qt.GlobalColor.transparent)
-        pt = QPainter(px)
-        pt.setRenderHint(QPainter.RenderHint.Antialiasing)
-        pt.setBrush(QBrush(QColor(200, 60, 60)))
-        pt.setPen(Qt.PenStyle.NoPen)
-        pt.drawEllipse(6, 6, 20, 20)
-        pt.end()
-        self.tray.setIcon(QIcon(px))
+        self.tray.setIcon(tray_icon())
         m = QMenu()
         m.setStyleSheet(GLOBAL_STYLESHEET)
         m.addAction("设置", self.open_settings)
+        m.addAction("撤销", self.undo)
+        m.addAction("重做", self.redo)
+        m.addAction("整理数据", self.compact_store)
+        m.addAction("导入数据...", self.import_data)
+        m.addAction("导出数据...", self.export_data)
+        vm = m.addMenu("视图")
+        group = QActionGroup(vm)
+        self.view_actions = {}
+        for mode in VIEW_MODES:
+            act = vm.addAction(VIEW_NAMES[mode], lambda mode=mode: self.set_view_mode(mode))
+            act.setCheckable(True)
+            act.setChecked(mode == self.view_mode)
+            group.addAction(act)
+            self.view_actions[mode] = act
+        self.act_perf = m.addAction("性能监测")
+        self.act_perf.setCheckable(True)
+        self.act_perf.triggered.connect(self.set_profiling)
+        self.act_perf_dump = m.addAction("导出性能数据...", self.dump_perf)
+        self.act_perf.setChecked(self.perf is not None)
+        self.act_perf_dump.setEnabled(self.perf is not None)
         m.addSeparator()
         m.addAction("显示/隐藏", self.toggle_visibility)
         self.act_lock = m.addAction("锁定/解锁")
         self.act_lock.setCheckable(True)
+        self.act_lock.setChecked(self.is_locked)
         self.act_lock.triggered.connect(self.toggle_lock)
         m.addAction("退出", self.quit_app)
         self.tray.setContextMenu(m)
@@ -985,13 +2628,23 @@ class TimeDotsWidget(QWidget):
                 'future_date_color': gc('future_date_color', self.config['future_date_color']),
                 'sound_type': d.get('sound_type', 1),
                 'sound_timer': d.get('sound_timer', 2),
-                'sound_note': d.get('sound_note', 1)
+                'sound_note': d.get('sound_note', 1),
+                'storage_backend': d.get('storage_backend', 'json'),
+                'compact_on_startup': d.get('compact_on_startup', False),
+                'undo_limit_kb': d.get('undo_limit_kb', 256),
+                'alarm_grace_min': d.get('alarm_grace_min', 5),
+                'lock_probe_ms': max(20, d.get('lock_probe_ms', 100)),
+                'sound_backend': d.get('sound_backend', 'auto')
             })
-            self.data_store = d.get('data_store', {})
+            self.data_store, self.schema_migrated = open_day_store(d)
         except Exception as e: 
             print(f"Config load error: {e}")
 
     def save_config(self):
+        # 只登记一次保存请求，实际写盘由 PersistenceService 合并后在后台完成
+        self.persistence.schedule()
+
+    def collect_persist_jobs(self):
         p = self.pos() 
         d = self.config.copy()
         d['start_time'] = d['start_time'].strftime("%H:%M")
@@ -1002,15 +2655,72 @@ class TimeDotsWidget(QWidget):
         d['past_date_color'] = self.config['past_date_color'].getRgb()
         d['future_date_color'] = self.config['future_date_color'].getRgb()
         d['window_pos'] = [p.x(), p.y()]
-        d['data_store'] = self.data_store
         for k in ['active_color', 'inactive_color']: 
             if k in d: del d[k]
+        # 先写数据分片，再写设置：迁移旧数据时保证历史不会丢失
+        jobs = self.data_store.take_dirty_jobs()
+        dump = json.dumps(d)
+        if dump != self._last_settings_dump:
+            self._last_settings_dump = dump
+            jobs.append((lambda: atomic_write_text(CONFIG_FILE, dump), lambda: setattr(self, '_last_settings_dump', None)))
+        return jobs
+
+    def save_day(self, key=None):
+        # 某一天的 segments/notes 被修改：标记所在分片为脏，再统一保存
+        if key is None: key = self.current_view_date.toString(Qt.DateFormat.ISODate)
+        self.data_store.mark_dirty(key)
+        self.summaries.invalidate((key,))
+        self.save_config()
+
+    # --- 性能监测 ---
+    def set_profiling(self, flag):
+        flag = bool(flag)
+        if self.tray is not None:
+            self.act_perf.setChecked(flag)
+            self.act_perf_dump.setEnabled(flag)
+        if flag == (self.perf is not None): return
+        if flag:
+            self.perf = PerfStats()
+            self.perf_overlay = PerfOverlay(self)
+        else:
+            self.perf_overlay.timer.stop()
+            self.perf_overlay.close()
+            self.perf_overlay.deleteLater()
+            self.perf, self.perf_overlay = None, None
+        self.persistence.perf = self.perf
+
+    def perf_report(self):
+        d = self.perf.snapshot()
+        d['layout_work'] = self.layout_work
+        d['native_updates_per_min'] = self.native_update_rate()
+        return d
+
+    def dump_perf(self, path=None):
+        if self.perf is None: return None
+        if not path:
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(os.path.dirname(CONFIG_FILE), f"timedots-perf-{stamp}.json")
         try:
-            with open(CONFIG_FILE, 'w') as f: json.dump(d, f)
-        except Exception as e: pass
+            atomic_write_text(path, json.dumps(self.perf_report(), indent=2))
+            if self.tray is not None and self.tray.isVisible(): self.tray.showMessage("Time Dots", f"性能数据已导出到 {path}")
+        except Exception as e:
+            print(f"Perf dump error: {e}")
+            return None
+        return path
+
+    def on_save_error(self, errors):
+        # 失败的数据已重新标脏，下一次保存 (或退出时) 会再写一次
+        if self.tray is not None and self.tray.isVisible():
+            self.tray.showMessage("Time Dots", f"保存失败，稍后会重试：{errors[-1]}", QSystemTrayIcon.MessageIcon.Warning)
 
     def quit_app(self):
         self.save_config()
+        errors = self.persistence.flush(notify=False)
+        if errors:
+            ans = QMessageBox.warning(None, "Time Dots", f"数据保存失败：{errors[-1]}\n\n仍要退出吗？未保存的修改将会丢失。",
+                                      QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
+            if ans != QMessageBox.StandardButton.Yes: return
+        if os.environ.get(PERF_ENV, '').endswith('.json'): self.dump_perf(os.environ[PERF_ENV])
         QApplication.instance().quit()
 
     def toggle_visibility(self):
@@ -1023,9 +2733,61 @@ class TimeDotsWidget(QWidget):
             self.current_popup = None
 
     def get_current_data(self):
+        # 只读：没有记录的日期返回共享的 EMPTY_DAY，不会在存储里留下空条目
+        k = self.current_view_date.toString(Qt.DateFormat.ISODate)
+        return self.data_store.get(k, EMPTY_DAY)
+
+    def current_view_key(self):
+        return self.current_view_date.toString(Qt.DateFormat.ISODate)
+
+    def get_current_data_for_write(self):
+        # 需要修改当天数据时才真正创建条目；调用方会修改数据，布局随之失效
         k = self.current_view_date.toString(Qt.DateFormat.ISODate)
-        if k not in self.data_store: self.data_store[k] = {"segments": [], "notes": {}}
-        return self.data_store[k]
+        self.data_version += 1
+        return self.data_store.setdefault(k, {"segments": [], "notes": {}})
+
+    def compact_store(self):
+        self.persistence.flush()
+        dropped, deduped, reclaimed = self.data_store.compact()
+        msg = f"清理空白日期 {dropped} 天，合并重复时间块 {deduped} 个，回收 {max(0, reclaimed) / 1024:.1f} KB"
+        if self.tray is not None and self.tray.isVisible(): self.tray.showMessage("Time Dots", msg)
+        self.summaries.invalidate()
+        self.reset_segment_index()
+        self.reset_alarms()
+        self.force_refresh_max_geometry()
+        self.update()
+        return dropped, deduped, reclaimed
+
+    def export_data(self):
+        path, _ = QFileDialog.getSaveFileName(None, "导出数据", "timedots.ndjson", "NDJSON (*.ndjson);;CSV (*.csv);;iCalendar (*.ics)")
+        if not path: return
+        self.persistence.flush()
+        try:
+            n = export_days(self.data_store, path)
+            self.tray.showMessage("Time Dots", f"已导出 {n} 天的数据")
+        except Exception as e:
+            print(f"Export error: {e}")
+
+    def import_data(self):
+        path, _ = QFileDialog.getOpenFileName(None, "导入数据", "", "Time Dots 数据 (*.ndjson *.jsonl *.csv *.ics)")
+        if not path: return
+        try:
+            n, bad = import_days(self.data_store, path)
+        except Exception as e:
+            # 读取失败时存储没有被改动，也不保存
+            print(f"Import error: {e}")
+            self.tray.showMessage("Time Dots", f"导入失败：{e}", QSystemTrayIcon.MessageIcon.Warning)
+            return
+        msg = f"已导入 {n} 条日期记录"
+        if bad: msg += f"，跳过 {bad} 条格式错误的记录"
+        self.tray.showMessage("Time Dots", msg, QSystemTrayIcon.MessageIcon.Warning if bad else QSystemTrayIcon.MessageIcon.Information)
+        # 整批导入只触发一次保存
+        self.save_config()
+        self.summaries.invalidate()
+        self.reset_segment_index()
+        self.reset_alarms()
+        self.force_refresh_max_geometry()
+        self.update()
 
     def get_grid_info(self):
         st = self.config['start_time']
@@ -1049,30 +2811,78 @@ class TimeDotsWidget(QWidget):
         cols = rd // inv
         return rows, cols, st.minute, total
 
-    def calc_layers(self, extra_seg=None):
-        data = self.get_current_data()
-        all_segs = data['segments'][:]
-        if extra_seg:
-            all_segs.append(extra_seg)
-        segs = sorted(all_segs, key=lambda x: x['start'])
-        layers_end = []
-        for s in segs:
-            placed = False
-            for i, end in enumerate(layers_end):
-                if end <= s['start']:
-                    layers_end[i] = s['end']
-                    s['layer'] = i
-                    placed = True
+    def grid_base(self):
+        # 网格第 0 个点对应的绝对分钟数 (开始时间所在的整点)，数据一律按绝对分钟存储
+        return self.config['start_time'].hour * 60
+
+    def note_key(self, idx):
+        return str(self.grid_base() + idx)
+
+    # --- 时间块分层索引：增量维护，只在切换日期 / 配置或整批修改后重建 ---
+    def segment_index_key(self):
+        return (self.config_version, self.current_view_date.toJulianDay())
+
+    def get_segment_index(self):
+        key = self.segment_index_key()
+        if self._seg_index is None or key != self._seg_index_key:
+            segs = list(self.get_current_data()['segments'])
+            if self.preview_segment: segs.append(self.preview_segment)
+            rows = self.get_grid_info()[0]
+            self._seg_index = SegmentIndex(segs, self.grid_base(), self.config['row_duration'] or 60, rows)
+            self._seg_index_key = key
+            self.layout_work += 1
+        return self._seg_index
+
+    def live_segment_index(self):
+        # 只返回已建立且与当前视图一致的索引；没有时由下一次布局整体重建，无需增量更新
+        if self._seg_index is not None and self._seg_index_key == self.segment_index_key():
+            return self._seg_index
+        return None
+
+    def segments_changed(self, added=(), removed=()):
+        # 当天时间块增删后调用 (数据已修改)；找不到对象时退回整体重建
+        idx = self.live_segment_index()
+        if idx is not None:
+            for s in removed:
+                if not idx.remove(s):
+                    self._seg_index = None
                     break
-            if not placed:
-                s['layer'] = len(layers_end)
-                layers_end.append(s['end'])
-        return segs
+            else:
+                for s in added: idx.insert(s)
+        self.data_version += 1
+
+    def reset_segment_index(self):
+        # 整批修改 (导入、整理、外部修改) 后整体重建
+        self._seg_index = None
+        self.data_version += 1
+
+    def set_preview_span(self, start, end):
+        idx = self.live_segment_index()
+        if idx is not None: idx.resize(self.preview_segment, start, end)
+        else: self.preview_segment['start'], self.preview_segment['end'] = start, end
+        self.preview_version += 1
+
+    def set_preview_segment(self, seg):
+        idx = self.live_segment_index()
+        if idx is not None and self.preview_segment is not None and not idx.remove(self.preview_segment):
+            idx = self._seg_index = None
+        self.preview_segment = seg
+        if idx is not None and seg is not None: idx.insert(seg)
+        self.preview_version += 1
+
+    def layout_key(self):
+        return (self.config_version, self.data_version, self.preview_version, self.current_view_date.toJulianDay(), self.view_mode)
 
     def update_grid_cache(self):
+        # 分层与行高只在配置、数据、预览或查看日期变化后重算一次
+        key = self.layout_key()
+        if key == self._layout_key: return
+        self._layout_key = key
+        self._ideal_dims.clear()
+        self.layout_work += 1
         rows, cols, _, _ = self.get_grid_info()
         if rows == 0: return
-        segs = self.calc_layers(extra_seg=self.preview_segment)
+        row_max = self.get_segment_index().row_max
         
         base_h_px = self.config['dot_radius'] * 2
         
@@ -1081,14 +2891,11 @@ class TimeDotsWidget(QWidget):
         step_b = self.config.get('seg_layer_step', 12)
         margin_c = self.config.get('seg_bottom_margin', 8)
         
+        old_heights = self.cached_row_heights
         self.cached_row_heights = {}
         for r in range(rows):
-            rs = r * self.config['row_duration']
-            re = (r+1) * self.config['row_duration']
-            max_l = -1
-            for s in segs:
-                if not (s['end'] <= rs or s['start'] >= re):
-                    max_l = max(max_l, s.get('layer', 0))
+            # 每行的最大层级由分层索引直接维护
+            max_l = row_max[r]
             
             # 计算行高：
             # 如果没有 segment (max_l == -1)，行高 = 圆点高度
@@ -1099,6 +2906,8 @@ class TimeDotsWidget(QWidget):
             else:
                 # 额外加 4px 是为了容纳最后一根线的视觉厚度
                 self.cached_row_heights[r] = base_h_px + offset_a + (max_l * step_b) + margin_c + 4
+        if self.cached_row_heights != old_heights:
+            self.row_heights_version += 1
 
     def get_vertical_margins(self, h_val, head_val):
         top_extra = HEADER_FULL_HEIGHT * head_val 
@@ -1129,10 +2938,7 @@ class TimeDotsWidget(QWidget):
              
         self.current_content_rect = QRect(int(draw_x), int(draw_y), int(ideal_w), int(ideal_h))
         
-        if not self.is_locked:
-            self.setMask(QRegion(self.current_content_rect.adjusted(-4, -4, 4, 4)))
-        elif self.controls_visible:
-            self.setMask(QRegion(self.current_content_rect.adjusted(-4, -4, 4, 4)))
+        self.update_mask()
 
     # [新增] 计算前 n 个缝隙的总宽度 (考虑了宽窄混合的情况)
     def get_cumulative_gap_offset(self, gap_count, expansion_ratio=1.0):
@@ -1157,6 +2963,14 @@ class TimeDotsWidget(QWidget):
 
     def calculate_ideal_dim(self, h_val, head_val):
         self.update_grid_cache()
+        # 同一布局下按 (hover, header) 记忆尺寸：一帧内的多次调用与稳定帧都直接命中
+        dims = self._ideal_dims.get((h_val, head_val))
+        if dims is not None: return dims
+        self.layout_work += 1
+        if self.view_mode != 'day':
+            dims = self.calculate_overview_dim(h_val, head_val)
+            self._ideal_dims[(h_val, head_val)] = dims
+            return dims
         rows, cols, _, _ = self.get_grid_info()
         r_base = self.config['dot_radius']
         
@@ -1183,12 +2997,22 @@ class TimeDotsWidget(QWidget):
                  h_content += sp_curr
         
         if head_val > 0.1:
-            min_header_w = 16 + (6*2 + 8)*2 + 6*2 + 16 
-            if w_content < min_header_w:
-                w_content = min_header_w
+            if w_content < HEADER_MIN_WIDTH:
+                w_content = HEADER_MIN_WIDTH
 
+        # 动画过程中每帧都是新的插值，防止记忆表无限增长
+        if len(self._ideal_dims) >= 64: self._ideal_dims.clear()
+        self._ideal_dims[(h_val, head_val)] = (w_content, h_content)
         return w_content, h_content
     
+    def calculate_overview_dim(self, h_val, head_val):
+        # 概览网格尺寸固定，不随 hover 展开；只有上下边距 (header / 底部信息栏) 随动画变化
+        gw, gh = OverviewGrid(self.view_mode, self.current_view_date).size()
+        top_m, bottom_m = self.get_vertical_margins(h_val, head_val)
+        w_content = BASE_MARGIN * 2 + gw
+        if head_val > 0.1: w_content = max(w_content, HEADER_MIN_WIDTH)
+        return w_content, top_m + bottom_m + gh
+
     def force_refresh_max_geometry(self):
         # 1. 记录调整前的状态
         old_geo = self.geometry()
@@ -1251,38 +3075,39 @@ class TimeDotsWidget(QWidget):
     def get_bg_rect(self):
         return self.current_content_rect
 
-    def get_col_x_offset(self, c_idx, col_unit):
+    def get_geometry(self):
+        # 点阵几何表按版本号缓存：配置、行高、动画值或内容区域位置变了才重建
+        bg = self.current_content_rect
+        key = (self.config_version, self.row_heights_version, self._hover_val, self._header_val, bg.left(), bg.top())
+        if key == self._geometry_key and self._geometry is not None:
+            return self._geometry
+        self.layout_work += 1
+        rows, cols, _, _ = self.get_grid_info()
+        rad, sp, sw = self.get_render_params()
+        top_m, _ = self.get_vertical_margins(self._hover_val, self._header_val)
         inv = self.config['interval']
-        if inv == 0: return 0
-        cols_per_30 = 30 // inv
-        if cols_per_30 == 0: cols_per_30 = 1 
+        cols_per_30 = max(1, 30 // inv) if inv else 1
         
-        # 计算当前列之前有多少个缝隙
-        num_gaps = c_idx // cols_per_30
+        # 每 30 分钟一个缝隙：整点处宽、半点处窄 (与 get_cumulative_gap_offset 一致)
+        gap_per_col = [0.0] * cols
+        if inv:
+            for c in range(cols_per_30, cols, cols_per_30):
+                k = c // cols_per_30
+                gap_per_col[c] = (GAP_WIDTH_WIDE if (k * 30) % 60 == 0 else GAP_WIDTH_NARROW) * self._hover_val
         
-        # [核心变化] 调用累加函数计算具体的像素偏移
-        return self.get_cumulative_gap_offset(num_gaps, self._hover_val)
+        heights = [self.cached_row_heights.get(r, 20) for r in range(rows)]
+        self._geometry = DotGeometry(heights, cols, bg.left() + BASE_MARGIN + sw, bg.top() + top_m,
+                                     rad, sp, 2*rad + sp, gap_per_col)
+        self._geometry_key = key
+        return self._geometry
 
     def get_dot_abs_pos(self, r_idx, c_idx):
-        bg = self.current_content_rect 
-        if not bg.isValid(): return QPointF(0,0)
-        
-        rad, sp, sw = self.get_render_params()
-        top_m, _ = self.get_vertical_margins(self._hover_val, self._header_val)
-        
-        y = bg.top() + top_m
-        for i in range(r_idx):
-            y += self.cached_row_heights.get(i, 20) 
-            y += sp 
-        y += rad 
-        col_unit = 2*rad + sp
-        gap_offset = self.get_col_x_offset(c_idx, col_unit)
-        
-        x = bg.left() + BASE_MARGIN + sw + c_idx * col_unit + rad + gap_offset
-        return QPointF(x, y)
+        if not self.current_content_rect.isValid(): return QPointF(0,0)
+        return self.get_geometry().pos(r_idx, c_idx)
 
+    @perf_timed('hit_idx')
     def get_idx_at_pos(self, pos):
-        if not self.current_content_rect.contains(pos): return -1
+        if self.view_mode != 'day' or not self.current_content_rect.contains(pos): return -1
         
         rows, cols, s_off, e_off = self.get_grid_info()
         rd = self.config['row_duration']
@@ -1292,45 +3117,18 @@ class TimeDotsWidget(QWidget):
         pos_f = QPointF(pos)
         
         if pos_f.y() < self.current_content_rect.top() + top_m: return -1
-        col_unit = 2*rad + sp
+        g = self.get_geometry()
         
-        rel_x = pos_f.x() - (self.current_content_rect.left() + BASE_MARGIN + sw)
-        
-        found_c = -1
-        for c in range(cols):
-            gap = self.get_col_x_offset(c, col_unit)
-            cx = c * col_unit + gap
-            center_x = cx + rad
-            
-            # [修改 1] 缩小列判定的水平范围：从 2.5倍半径 改为 1倍半径
-            # 只有鼠标水平位置严格在圆点宽度内时，才认为命中了该列
-            if abs(rel_x - center_x) <= 1.2*rad:
-                found_c = c
-                break
-                
+        # 列与行都在有序边界上二分查找，不再逐列逐行扫描
+        # 列判定的水平范围为 1.2 倍半径，只有鼠标水平位置在圆点宽度附近时才认为命中该列
+        found_c = g.col_at(pos_f.x(), 1.2*rad)
         if found_c == -1: return -1
-        
-        curr_y = self.current_content_rect.top() + top_m
-        found_r = -1
-        for r in range(rows):
-            row_h = self.cached_row_heights.get(r, 20)
-            total_row_block = row_h + sp
-            if curr_y <= pos_f.y() < curr_y + total_row_block:
-                found_r = r
-                break
-            curr_y += total_row_block
-            
+        found_r = g.row_at(pos_f.y())
         if found_r == -1: return -1
         
-        center = self.get_dot_abs_pos(found_r, found_c)
-        
-        # [修改 2] 缩小最终判定范围：使用严格的欧几里得距离
-        # 只有鼠标距离圆心的距离小于半径时，才算命中
-        # 原来的代码是 .manhattanLength() < rad * 2.5，范围是一个很大的菱形
-        dx = pos_f.x() - center.x()
-        dy = pos_f.y() - center.y()
-        
-        # 使用平方比较避免开根号，效率稍高且逻辑等价
+        # 严格的欧几里得距离：只有鼠标距离圆心小于半径时才算命中 (平方比较避免开根号)
+        dx = pos_f.x() - float(g.col_x[found_c])
+        dy = pos_f.y() - float(g.row_y[found_r])
         if (dx*dx + dy*dy) <= rad*rad:
              idx = found_r*rd + found_c*inv
              if idx < s_off or idx >= e_off: return -1
@@ -1338,58 +3136,85 @@ class TimeDotsWidget(QWidget):
              
         return -1
     
-    def get_segment_at_pos(self, pos):
-        if not self.current_content_rect.contains(pos): return None
-        data = self.get_current_data()
-        segs = data['segments'][:]
-        if self.preview_segment: segs.append(self.preview_segment)
+    def segment_hit_spans(self, s, g):
+        # 线段在每一行上的判定区间 (r, x1, x2)，只包含可见的行
         rad, sp, sw = self.get_render_params()
         rd = self.config['row_duration']
         inv = self.config['interval']
-        pos_f = QPointF(pos)
+        rows = self.get_grid_info()[0]
+        base = self.grid_base()
+        s_idx = s['start'] - base; e_idx = s['end'] - base
+        s_row = s_idx // rd; e_row = e_idx // rd
+        last_c = (rd//inv) - 1
+        for r in range(max(0, s_row), min(rows - 1, e_row) + 1):
+            row_s = r * rd; row_e = (r+1) * rd
+            d_s = max(s_idx, row_s); d_e = min(e_idx, row_e)
+            if d_s >= d_e: continue
+            x1 = float(g.col_x[(d_s % rd) // inv]) - rad - sp/2
+            if d_e == row_e: x2 = float(g.col_x[last_c]) + rad + sp/2
+            else: x2 = float(g.col_x[(d_e % rd) // inv]) - rad - sp/2
+            # 与 QRectF.contains 一致：零宽区间不命中，起止在同一个点内时区间反向
+            if x1 == x2: continue
+            yield r, min(x1, x2), max(x1, x2)
+
+    def get_hit_index(self):
+        # 行 -> (x1 升序表, [(x1, x2, 数据序号, seg)], 最大宽度)。只依赖线段起止与几何，随几何对象或数据版本变化整体重建。
+        # 层号不入键：拖拽预览会让同簇线段重新分层，查询时直接读 seg['layer']；预览线段本身单独判定
+        self.update_grid_cache()
+        g = self.get_geometry()
+        key = (self.data_version, self.current_view_date.toJulianDay())
+        if self._hit_geo is g and self._hit_key == key: return self._hit_rows
+        spans = {}
+        for n, s in enumerate(self.get_current_data()['segments']):
+            for r, x1, x2 in self.segment_hit_spans(s, g):
+                spans.setdefault(r, []).append((x1, x2, n, s))
+        rows = {}
+        for r, lst in spans.items():
+            lst.sort(key=lambda e: e[0])
+            rows[r] = ([e[0] for e in lst], lst, max(e[1] - e[0] for e in lst))
+        self._hit_geo, self._hit_key, self._hit_rows = g, key, rows
+        return rows
+
+    @perf_timed('hit_seg')
+    def get_segment_at_pos(self, pos):
+        if self.view_mode != 'day' or not self.current_content_rect.contains(pos): return None
+        hit_rows = self.get_hit_index()
+        g = self.get_geometry()
+        x = pos.x(); y = pos.y()
+        r = g.row_at(y)
+        if r == -1: return None
+        rad, sp, sw = self.get_render_params()
         
-        # 读取布局参数
+        # 读取布局参数：第 layer 层线段的中心位于 圆心 + rad + offset_a + layer * step_b
         offset_a = self.config.get('seg_base_offset', 6)
         step_b = self.config.get('seg_layer_step', 12)
         
         # [核心修复] 严格的判定高度，不随 layer_step 变大而变大
         # 无论间距拉多大，只检测线段上下 4px 的范围 (总高 8px)
         hit_threshold = 4.0 
-
-        for s in segs:
-            layer = s.get('layer', 0)
-            y_offset_from_center = rad + offset_a + (layer * step_b)
-            
-            s_idx = s['start']; e_idx = s['end']
-            s_row = s_idx // rd; e_row = e_idx // rd
-            
-            for r in range(s_row, e_row + 1):
-                row_s = r * rd; row_e = (r+1) * rd
-                d_s = max(s_idx, row_s); d_e = min(e_idx, row_e)
-                if d_s >= d_e: continue 
-                
-                c_s = (d_s % rd) // inv
-                p1 = self.get_dot_abs_pos(r, c_s)
-                x1 = p1.x() - rad - (sp/2)
-                
-                if d_e == row_e:
-                    p_end = self.get_dot_abs_pos(r, (rd//inv)-1)
-                    x2 = p_end.x() + rad + sp/2
-                else:
-                    c_e = (d_e % rd) // inv
-                    p_end = self.get_dot_abs_pos(r, c_e)
-                    x2 = p_end.x() - rad - sp/2
-                
-                y_line = p1.y() + y_offset_from_center
-                
-                # 创建一个窄的判定矩形
-                rect = QRectF(x1, y_line - hit_threshold, x2 - x1, hit_threshold * 2)
-                
-                if rect.contains(pos_f): return s
+        rel = y - (float(g.row_y[r]) + rad + offset_a)
+        
+        # 只检查本行中 x1 <= x 且 x - x1 <= 最大宽度 的候选，多个命中时取数据顺序靠前的。
+        # 宽度比较留一点浮点容差：x 正好落在右端点 (x == x2) 时 x - max_w 可能略大于 x1
+        best = None
+        if r in hit_rows:
+            x1s, entries, max_w = hit_rows[r]
+            i = bisect_right(x1s, x) - 1
+            while i >= 0 and x - x1s[i] <= max_w + 1e-6:
+                x1, x2, n, s = entries[i]
+                if x <= x2 and abs(rel - s.get('layer', 0) * step_b) <= hit_threshold and (best is None or n < best[0]):
+                    best = (n, s)
+                i -= 1
+        if best: return best[1]
+        
+        p = self.preview_segment
+        if p and abs(rel - p.get('layer', 0) * step_b) <= hit_threshold:
+            for pr, x1, x2 in self.segment_hit_spans(p, g):
+                if pr == r and x1 <= x <= x2: return p
         return None
 
     def get_date_at_pos(self, pos):
-        if not self.current_content_rect.contains(pos): return None
+        if self.view_mode != 'day' or not self.current_content_rect.contains(pos): return None
         if self._hover_val <= 0.01: return None
         bg_rect = self.current_content_rect
         dh = CALENDAR_HEIGHT
@@ -1457,10 +3282,94 @@ class TimeDotsWidget(QWidget):
         grn = QRectF(base_x + (r*2 + gap)*2, base_y, r*2, r*2)
         return red, yel, grn
 
+    # --- 脏区域：各元素的包围矩形，交给 update(QRect) 做局部重绘 ---
+    def invalidate(self, *rects):
+        for rc in rects:
+            if rc is None: continue
+            if isinstance(rc, QRectF): rc = rc.toAlignedRect()
+            rc = rc.adjusted(-DIRTY_MARGIN, -DIRTY_MARGIN, DIRTY_MARGIN, DIRTY_MARGIN).intersected(self.rect())
+            if not rc.isEmpty(): self.update(rc)
+
+    def dot_rect(self, idx):
+        rows, cols, s_off, e_off = self.get_grid_info()
+        rd = self.config['row_duration']
+        inv = self.config['interval']
+        if idx < s_off or idx >= e_off: return None
+        cp = self.get_dot_abs_pos(idx // rd, (idx % rd) // inv)
+        # hover 时圆点放大 1.3 倍
+        r = self.config['dot_radius'] * 1.3
+        return QRectF(cp.x() - r, cp.y() - r, 2*r, 2*r)
+
+    def segment_rects(self, seg, minute=None):
+        # 时间块逐行的线段矩形；给定 minute 时只返回包含该时刻的那一行
+        base = self.grid_base()
+        half = 3.0
+        out = []
+        for d_s, d_e, x1, x2, y in self.segment_spans(seg['start'] - base, seg['end'] - base, seg.get('layer', 0)):
+            if minute is not None and not (d_s <= minute <= d_e): continue
+            out.append(QRectF(x1 - half, y - half, x2 - x1 + 2*half, 2*half))
+        return out
+
+    def calendar_day_rect(self, d):
+        if d is None or self._hover_val <= 0.01: return None
+        bg = self.current_content_rect
+        visible_count, step_x, first_center_x = self.get_calendar_layout(bg.width())
+        start_date = self.current_view_date.addDays(-((visible_count - 1) // 2))
+        i = start_date.daysTo(d)
+        if not (0 <= i < visible_count): return None
+        cx = first_center_x + (i + self.cal_anim_val) * step_x
+        cy = bg.bottom() - BASE_MARGIN - CALENDAR_HEIGHT / 2
+        # 星期文字在圆点上方，日期文字在下方
+        return QRectF(cx - 20, cy - 26, 40, 52)
+
+    def header_rect(self):
+        r, y, g = self.get_traffic_lights_rects()
+        return r.united(y).united(g).adjusted(-2, -2, 2, 2)
+
+    def hover_state(self):
+        return (self.hovered_dot_idx, self.hovered_segment, self.hovered_light_idx,
+                self.hovered_date, self.hovered_arrow, self.hovered_info, self.hovered_cell)
+
+    def invalidate_hover(self, old):
+        # 只重绘 hover 状态发生变化的元素 (旧的与新的都要重画)
+        new = self.hover_state()
+        o_dot, o_seg, o_light, o_date, o_arrow, o_info, o_cell = old
+        n_dot, n_seg, n_light, n_date, n_arrow, n_info, n_cell = new
+        if o_cell != n_cell:
+            # 概览：两个单元格加上底部显示当天详情的信息栏
+            g = self.get_overview_grid()
+            self.invalidate(*[g.rect(d) for d in (o_cell, n_cell) if d is not None], self.overview_footer_rect())
+        if o_dot != n_dot:
+            self.invalidate(self.dot_rect(o_dot) if o_dot != -1 else None,
+                            self.dot_rect(n_dot) if n_dot != -1 else None)
+        if o_seg is not n_seg:
+            for s in (o_seg, n_seg):
+                if s is not None: self.invalidate(*self.segment_rects(s))
+        if o_light != n_light:
+            self.invalidate(self.header_rect())
+        if o_date != n_date:
+            self.invalidate(self.calendar_day_rect(o_date), self.calendar_day_rect(n_date))
+        if o_arrow != n_arrow:
+            self.invalidate(*[self.arrow_rects.get(k) for k in (o_arrow, n_arrow) if k])
+        if o_info != n_info and hasattr(self, 'interval_info_rect'):
+            self.invalidate(self.interval_info_rect)
+
+    def invalidate_current_time(self, prev_mins, passed_mins):
+        # 每秒的 "当前" 刷新：只重画从上次到现在跨过的圆点，以及正在进行中的时间块线段
+        inv = self.config['interval']
+        if prev_mins is None or passed_mins < prev_mins or passed_mins - prev_mins > 60:
+            self.update()
+            return
+        first = int(prev_mins // inv) * inv
+        last = int(passed_mins // inv) * inv
+        self.invalidate(*[self.dot_rect(i) for i in range(first - inv, last + 1, inv)])
+        for s in self.get_current_data()['segments']:
+            self.invalidate(*self.segment_rects(s, minute=passed_mins))
+
     def show_popup(self, idx, global_pos):
         self.close_current_popup()
         data = self.get_current_data()
-        curr_note = data['notes'].get(str(idx), {})
+        curr_note = data['notes'].get(self.note_key(idx), {})
         pop = EditPopup(self, 
                         initial_color=QColor(*curr_note['color']) if 'color' in curr_note else None,
                         initial_text=curr_note.get('text', ""),
@@ -1473,16 +3382,20 @@ class TimeDotsWidget(QWidget):
 
     def show_segment_popup(self, seg, global_pos):
         self.close_current_popup()
-        self.preview_segment = None 
+        self.set_preview_segment(None)
         c = QColor(*seg['color'])
         txt = seg.get('text', "")
         def on_live_change(new_c, new_t):
             seg['color'] = [new_c.red(), new_c.green(), new_c.blue()]
             seg['text'] = new_t
             self.update()
+        old = {'color': list(seg['color']), 'text': txt}
         def save_seg(new_c, new_t):
             on_live_change(new_c, new_t)
-            self.save_config()
+            new = {'color': list(seg['color']), 'text': seg['text']}
+            if new != old:
+                self.journal.record('seg_edit', date=self.current_view_key(), seg=seg, old=old, new=new)
+            self.save_day()
         def del_seg_action():
             self.del_seg(seg)
         pop = EditPopup(self, 
@@ -1497,75 +3410,69 @@ class TimeDotsWidget(QWidget):
         pop.show()
 
     def update_mask(self):
-        if not self.is_locked:
-            self.setMask(QRegion(self.current_content_rect.adjusted(-4, -4, 4, 4)))
-            return
-
-        if self.controls_visible:
-            self.setWindowFlag(Qt.WindowType.WindowTransparentForInput, False)
-            self.setMask(QRegion(self.current_content_rect.adjusted(-4, -4, 4, 4)))
-            self.show()
-        else:
-            self.clearMask()
-            self.setWindowFlag(Qt.WindowType.WindowTransparentForInput, True)
-            self.show()
+        # 只维护遮罩；锁定时的鼠标穿透由 LockedHoverProbe 通过 set_click_through 控制。
+        # 设置遮罩要与窗口系统往返一次，记住上次应用的矩形，没有变化就不提交
+        want = None
+        if not self.is_locked or self.controls_visible:
+            want = self.current_content_rect.adjusted(-4, -4, 4, 4)
+        if want == self._mask_rect: return
+        self._mask_rect = want
+        if want is None: self.clearMask()
+        else: self.setMask(QRegion(want))
+        self.note_native_update('mask')
+
+    def note_native_update(self, kind):
+        self.native_updates[kind].append(monotonic())
+        if self.perf: self.perf.count(kind)
+
+    def native_update_rate(self):
+        # 最近一分钟内真正提交给窗口系统的遮罩 / 窗口标志更新次数
+        cutoff = monotonic() - 60
+        for q in self.native_updates.values():
+            while q and q[0] < cutoff: q.popleft()
+        return {k: len(q) for k, q in self.native_updates.items()}
+
+    def set_click_through(self, flag):
+        # 切换 WindowTransparentForInput 会重建原生窗口，只在状态真正变化时才做
+        if flag == self._click_through: return
+        self._click_through = flag
+        was_visible = self.isVisible()
+        # 重建窗口时的 hide/show 不是用户隐藏，不能打断悬停探测
+        self._reflagging = True
+        self.setWindowFlag(Qt.WindowType.WindowTransparentForInput, flag)
+        if was_visible: self.show()
+        self._reflagging = False
+        self.note_native_update('flags')
+
+    def set_locked_state(self, controls_visible, click_through):
+        if controls_visible != self.controls_visible:
+            self.controls_visible = controls_visible
+            self.update_mask()
+            self.kick_animation()
+        self.set_click_through(click_through)
+        if click_through and (self.hovered_dot_idx != -1 or self.hovered_segment is not None or self.hovered_date is not None
+                              or self.hovered_cell is not None):
+            old_hover = self.hover_state()
+            self.hovered_dot_idx = -1
+            self.hovered_segment = None
+            self.hovered_date = None
+            self.hovered_arrow = None
+            self.hovered_cell = None
+            self.setCursor(Qt.CursorShape.ArrowCursor)
+            self.invalidate_hover(old_hover)
 
+    @perf_timed('loop')
     def loop(self):
         # ---------------------------------------------------------
-        # 1. [原有逻辑] 鼠标交互与锁定状态处理 (保持不变)
+        # 1. 动画目标：锁定时的悬停与穿透由 LockedHoverProbe 低频维护，这里只读结果
         # ---------------------------------------------------------
-        global_pos = QCursor.pos()
-        local_pos = self.mapFromGlobal(global_pos)
-        
-        in_content = self.current_content_rect.contains(local_pos)
-        
-        target_hover = 0.0
-        target_header = 0.0
-        
         if self.is_locked:
-            if in_content:
-                self.hover_time_acc += 50 
-                if self.hover_time_acc > 1200: 
-                    self.controls_visible = True
-            else:
-                self.hover_time_acc = 0
-                self.controls_visible = False
-            
-            desired_transparent = True 
-            
-            if self.controls_visible:
-                r, y, g = self.get_traffic_lights_rects()
-                hit_zone = r.united(y).united(g).adjusted(-5, -5, 5, 5)
-                if hit_zone.contains(QPointF(local_pos)):
-                    desired_transparent = False 
-            
-            current_transparent = bool(self.windowFlags() & Qt.WindowType.WindowTransparentForInput)
-            if current_transparent != desired_transparent:
-                self.setWindowFlag(Qt.WindowType.WindowTransparentForInput, desired_transparent)
-                self.show()
-
-            if desired_transparent:
-                if self.hovered_dot_idx != -1 or self.hovered_segment is not None or self.hovered_date is not None:
-                    self.hovered_dot_idx = -1
-                    self.hovered_segment = None
-                    self.hovered_date = None
-                    self.hovered_arrow = None
-                    self.setCursor(Qt.CursorShape.ArrowCursor)
-                    self.update()
-
             target_hover = 0.0 
             target_header = 1.0 if self.controls_visible else 0.0
-            
         else:
+            in_content = self.current_content_rect.contains(self.mapFromGlobal(QCursor.pos()))
             target_header = 1.0 if (in_content or self.config['sidebar_always_on']) else 0.0
             target_hover = 1.0 if (in_content or self.config['sidebar_always_on']) else 0.0
-            self.controls_visible = False
-            self.hover_time_acc = 0
-            
-            current_transparent = bool(self.windowFlags() & Qt.WindowType.WindowTransparentForInput)
-            if current_transparent:
-                self.setWindowFlag(Qt.WindowType.WindowTransparentForInput, False)
-                self.show()
 
         # ---------------------------------------------------------
         # 2. [原有逻辑] 动画插值 (保持不变)
@@ -1586,70 +3493,103 @@ class TimeDotsWidget(QWidget):
             self._header_val = target_header
 
         if needs_repaint:
+            # 展开/收起动画只影响内容区域，重绘新旧内容矩形的并集即可 (含遮罩外扩的 4px)
+            old_rect = QRect(self.current_content_rect)
             self.update_layout_dynamic()
-            self.update()
-
-        # ---------------------------------------------------------
-        # 3. [原有逻辑] 日期变更检查 (保持不变)
-        # ---------------------------------------------------------
+            self.kick_animation()
+            self.invalidate(old_rect.united(self.current_content_rect).adjusted(-4, -4, 4, 4))
+        else:
+            # 插值已收敛：停下帧定时器，等待下一个事件 (进入/离开、锁定探测、配置变化)
+            self.timer.stop()
+
+    # --- 动画时钟 ---
+    def kick_animation(self):
+        # 有交互或状态变化时启动帧定时器；锁定时同时启动低频悬停探测
+        if not self.isVisible(): return
+        if not self.timer.isActive(): self.timer.start()
+        if self.is_locked: self.lock_probe.start()
+
+    def on_clock_tick(self):
+        # 每分钟整点唤醒一次：日期变更、"当前" 圆点与进行中的时间块。
+        # 提醒由 alarm_timer 精确唤醒，这里顺带补查一次，防止系统休眠后定时器延迟
+        self.check_alarms()
         now_date = QDate.currentDate()
         if self.last_date_check != now_date:
             if self.current_view_date == self.last_date_check:
                 self.current_view_date = now_date
+                self.preload_visible_months()
                 self.update()
             self.last_date_check = now_date
+            self.reset_alarms()
 
-        # ---------------------------------------------------------
-        # 4. [修正后] 声音检查逻辑
-        # ---------------------------------------------------------
         now = datetime.now()
-        curr_min = now.minute
 
-        if self.last_sound_min != curr_min:
-            self.last_sound_min = curr_min
-            
-            # [修正] 永远获取 "今天" 的数据，不论当前视图在看哪一天
-            today_str = now_date.toString(Qt.DateFormat.ISODate)
-            
-            if today_str in self.data_store:
-                data = self.data_store[today_str]
-                current_day_min = now.hour * 60 + now.minute
-                
-                # --- 检查 Segments ---
-                for s in data['segments']:
-                    if 'end_abs' in s:
-                        end_min = s['end_abs']
-                    else:
-                        # [重要修正] s['end'] 存储的是分钟数，不是索引，不需要再乘 interval
-                        # 之前的错误公式：start_base + s['end'] * inv
-                        # 修正后的公式：start_base + s['end']
-                        st = self.config['start_time']
-                        start_base = st.hour * 60 + st.minute
-                        end_min = start_base + s['end']
-                    
-                    if int(end_min) == current_day_min: 
-                        play_sound_by_type(self.config['sound_timer'])
-                
-                # --- 检查 Notes ---
-                inv = self.config['interval']
-                # Note 检查逻辑：当前分钟正好是 Interval 的倍数
-                if current_day_min % inv == 0:
-                    st = self.config['start_time']
-                    start_base = st.hour * 60 + st.minute
-                    
-                    if current_day_min >= start_base:
-                        # s['end'] 是分钟数，同理 Note 的 key 也是分钟数索引
-                        curr_offset_min = int(current_day_min - start_base)
-                        if str(curr_offset_min) in data['notes']:
-                            play_sound_by_type(self.config['sound_note'])
+        # 圆点边界都落在整分钟上，只重绘跨过的圆点与进行中的时间块
+        if self.view_mode != 'day':
+            # 概览视图每分钟只有 "今天" 的当前时间线会变，整体重画一次也很便宜
+            self.update()
+            self._last_tick_mins = None
+        elif self.current_view_date == now_date:
+            view_dt = datetime.combine(now.date(), time(self.config['start_time'].hour, 0))
+            passed_mins = (now - view_dt).total_seconds() / 60
+            self.invalidate_current_time(self._last_tick_mins, passed_mins)
+            self._last_tick_mins = passed_mins
+        else:
+            self._last_tick_mins = None
+
+        # 睡到下一分钟开始 (多留几毫秒，避免提前醒来仍停在上一分钟)
+        self.clock_timer.start((60 - now.second) * 1000 - now.microsecond // 1000 + 5)
+
+    # --- 提醒 ---
+    def reset_alarms(self):
+        today = QDate.currentDate().toString(Qt.DateFormat.ISODate)
+        self.alarms.reset(datetime.now().date(), self.data_store.get(today, EMPTY_DAY))
+        self.arm_alarm_timer()
+
+    def sync_alarms(self, key, segs_added=(), segs_removed=(), notes_added=(), notes_removed=()):
+        # 编辑只增量更新今天的提醒堆，其他日期的修改与提醒无关
+        if key != self.alarms.date_key: return
+        for s in segs_removed: self.alarms.remove(int(s['end']), 'timer')
+        for s in segs_added: self.alarms.add(int(s['end']), 'timer')
+        for k in notes_removed: self.alarms.remove(int(k), 'note')
+        for k in notes_added: self.alarms.add(int(k), 'note')
+        self.arm_alarm_timer()
+
+    def arm_alarm_timer(self):
+        # 只为最近的一个提醒定一次单发定时器 (最长睡一小时，分钟时钟兜底)
+        deadline = self.alarms.next_deadline()
+        if deadline is None:
+            self.alarm_timer.stop()
+            return
+        ms = (deadline - datetime.now()).total_seconds() * 1000
+        self.alarm_timer.start(max(0, min(int(ms) + 5, 3600 * 1000)))
 
-        # ---------------------------------------------------------
-        # 5. [原有逻辑] 界面微秒级刷新 (保持不变)
-        # ---------------------------------------------------------
-        if self.current_view_date == QDate.currentDate():
-            if now.microsecond < 150000: 
-                self.update()
-                
+    def check_alarms(self):
+        due, _ = self.alarms.pop_due(datetime.now())
+        if 'timer' in due: self.sound.play(self.config['sound_timer'])
+        if 'note' in due: self.sound.play(self.config['sound_note'])
+        self.arm_alarm_timer()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.kick_animation()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        if self._reflagging: return
+        # 隐藏时不需要任何动画；分钟时钟继续运行，提醒照常触发
+        self.timer.stop()
+        self.lock_probe.stop()
+
+    def enterEvent(self, event):
+        super().enterEvent(event)
+        self.kick_animation()
+
+    def leaveEvent(self, event):
+        super().leaveEvent(event)
+        self.kick_animation()
+
+    @perf_timed('paint')
     def paintEvent(self, event):
         if self.current_content_rect.isNull():
              self.update_layout_dynamic()
@@ -1671,19 +3611,18 @@ class TimeDotsWidget(QWidget):
         elif win_geo.top() <= screen_geo.top() + 5: draw_y = padding
              
         self.current_content_rect = QRect(int(draw_x), int(draw_y), int(ideal_w), int(ideal_h))
-        
-        if not self.is_locked:
-            self.setMask(QRegion(self.current_content_rect.adjusted(-4, -4, 4, 4)))
+        self.update_mask()
 
         rad, sp, sw = self.get_render_params()
         rows, cols, s_off, e_off = self.get_grid_info()
-        rd = self.config['row_duration']
         inv = self.config['interval']
         bg_rect = QRectF(self.current_content_rect) 
         
-        pt.setBrush(QBrush(self.config['bg_color']))
-        pt.setPen(Qt.PenStyle.NoPen)
-        pt.drawRoundedRect(bg_rect, 16, 16)
+        # 背景与时间刻度来自缓存的静态层，稳定状态下每帧只需贴图；概览视图自己画背景与网格
+        if self.view_mode == 'day':
+            pt.drawPixmap(self.current_content_rect.topLeft(), self.get_static_layer())
+        else:
+            self.draw_overview(pt)
         
         # 绘制 Header
         if self._header_val > 0.01:
@@ -1753,6 +3692,78 @@ class TimeDotsWidget(QWidget):
                 draw_light(y_rect, QColor(255, 189, 46), self.hovered_light_idx == 1)
                 draw_light(g_rect, QColor(39, 201, 63), self.hovered_light_idx == 2)
 
+        if self.view_mode != 'day':
+            if self._hover_val > 0.01: self.draw_overview_footer(pt)
+        else:
+            # 绘制点阵
+            now = datetime.now()
+            view_dt = datetime.combine(self.current_view_date.toPyDate(), time(self.config['start_time'].hour, 0))
+            passed_mins = (now - view_dt).total_seconds() / 60
+            is_today = (self.current_view_date == QDate.currentDate())
+            curr_data = self.get_current_data()
+            notes = curr_data['notes']
+            base = self.grid_base()
+            self.draw_dots(pt, passed_mins, is_today, notes)
+
+            # 绘制 Segment
+            segs = list(curr_data['segments'])
+            if self.preview_segment: segs.append(self.preview_segment)
+            for s in segs:
+                col = QColor(*s['color'])
+                is_hovered = (s == self.hovered_segment)
+                is_prev = (s == self.preview_segment)
+                self.draw_segment(pt, s['start'] - base, s['end'] - base, col, s.get('layer', 0), passed_mins, is_today, is_hovered=is_hovered, is_preview=is_prev)
+
+            # 绘制日历
+            if self._hover_val > 0.01:
+                dh = CALENDAR_HEIGHT
+                cal_base = bg_rect.bottom() - BASE_MARGIN
+                pt.save()
+                path = QPainterPath()
+                path.addRoundedRect(bg_rect, 16, 16)
+                pt.setClipPath(path)
+                self.draw_calendar_bar(pt, cal_base - dh/2, bg_rect.width(), dh, bg_rect.left())
+                pt.restore()
+
+        if self.first_frame_at is None:
+            # 首帧已画出：托盘、日历月份预取等首帧用不到的初始化排到事件循环的下一轮
+            self.first_frame_at = perf_counter()
+            QTimer.singleShot(0, self.finish_startup)
+
+    def get_static_layer(self):
+        # 静态层：圆角背景、侧栏小时、行内整点数字与半点虚线。
+        # 只在配置、日期、布局或 (量化后的) hover/header 动画值变化时重画
+        bg = self.current_content_rect
+        dpr = self.devicePixelRatioF()
+        key = (self.config_version, self.current_view_date.toJulianDay(),
+               round(self._hover_val * 64), round(self._header_val * 64),
+               bg.width(), bg.height(), dpr, tuple(self.cached_row_heights.values()))
+        if key == self._static_layer_key and self._static_layer is not None:
+            return self._static_layer
+        px = QPixmap(max(1, math.ceil(bg.width() * dpr)), max(1, math.ceil(bg.height() * dpr)))
+        px.setDevicePixelRatio(dpr)
+        px.fill(Qt.GlobalColor.transparent)
+        pt = QPainter(px)
+        pt.setRenderHint(QPainter.RenderHint.Antialiasing)
+        # 坐标与窗口一致，画完后按 content rect 的左上角贴回
+        pt.translate(-bg.left(), -bg.top())
+        self.draw_static_layer(pt)
+        pt.end()
+        self._static_layer = px
+        self._static_layer_key = key
+        return px
+
+    def draw_static_layer(self, pt):
+        rad, sp, sw = self.get_render_params()
+        rows, cols, s_off, e_off = self.get_grid_info()
+        rd = self.config['row_duration']
+        inv = self.config['interval']
+        bg_rect = QRectF(self.current_content_rect) 
+        
+        pt.setBrush(QBrush(self.config['bg_color']))
+        pt.setPen(Qt.PenStyle.NoPen)
+        pt.drawRoundedRect(bg_rect, 16, 16)
+
         # 绘制网格
         if self._hover_val > 0.05:
             op = int(255 * self._hover_val)
@@ -1807,64 +3818,95 @@ class TimeDotsWidget(QWidget):
                         pt.restore()
                         pt.setPen(QColor(255, 255, 255, op))
 
-        # 绘制点阵
-        now = datetime.now()
-        view_dt = datetime.combine(self.current_view_date.toPyDate(), time(self.config['start_time'].hour, 0))
-        passed_mins = (now - view_dt).total_seconds() / 60
-        is_today = (self.current_view_date == QDate.currentDate())
-        curr_data = self.get_current_data()
-        notes = curr_data['notes']
-        
+    def get_dot_points(self):
+        # 所有有效圆点按分钟顺序排好的中心坐标，随几何表一起失效
+        g = self.get_geometry()
+        if self._dot_points_geo is g: return self._dot_idx, self._dot_points
+        rows, cols, s_off, e_off = self.get_grid_info()
+        rd = self.config['row_duration']
+        inv = self.config['interval']
+        self._dot_idx = []
+        pts = []
         for r in range(rows):
             for c in range(cols):
                 idx = r*rd + c*inv
                 if idx < s_off or idx >= e_off: continue
-                cp = self.get_dot_abs_pos(r, c)
-                r_real = rad
-                if idx == self.hovered_dot_idx: r_real *= 1.3 
-                col = self.config['active_color']
-                if is_today:
-                    if idx < passed_mins:
-                        if idx + inv > passed_mins: col = self.config['current_color']
-                        else: col = self.config['inactive_color']
-                    else: col = self.config['active_color']
-                elif self.current_view_date < QDate.currentDate():
-                    col = self.config['inactive_color']
-                if idx == self.hovered_dot_idx: col = col.lighter(150)
-                pt.setBrush(QBrush(col))
-                pt.setPen(Qt.PenStyle.NoPen)
-                pt.drawEllipse(cp, r_real, r_real)
-                if str(idx) in notes:
-                    nc = notes[str(idx)]['color']
-                    pt.setBrush(QBrush(QColor(*nc)))
-                    pt.drawEllipse(cp, r_real*self.config.get('note_dot_scale', 0.4), r_real*self.config.get('note_dot_scale', 0.4))
-
-        # 绘制 Segment
-        segs = curr_data['segments'][:]
-        if self.preview_segment: segs.append(self.preview_segment)
-        for s in segs:
-            col = QColor(*s['color'])
-            is_hovered = (s == self.hovered_segment)
-            is_prev = (s == self.preview_segment)
-            self.draw_segment(pt, s['start'], s['end'], col, s.get('layer', 0), passed_mins, is_today, is_hovered=is_hovered, is_preview=is_prev)
-
-        # 绘制日历
-        if self._hover_val > 0.01:
-            dh = CALENDAR_HEIGHT
-            cal_base = bg_rect.bottom() - BASE_MARGIN
-            pt.save()
-            path = QPainterPath()
-            path.addRoundedRect(bg_rect, 16, 16)
-            pt.setClipPath(path)
-            self.draw_calendar_bar(pt, cal_base - dh/2, bg_rect.width(), dh, bg_rect.left())
-            pt.restore()
-
-    def draw_segment(self, pt, start_idx, end_idx, color, layer, passed_mins, is_today, is_hovered=False, is_preview=False):
+                self._dot_idx.append(idx)
+                pts.append(g.pos(r, c))
+        self._dot_points = QPolygonF(pts)
+        self._dot_points_geo = g
+        return self._dot_idx, self._dot_points
+
+    def note_color(self, rgb):
+        c = self._color_cache.get(tuple(rgb))
+        if c is None:
+            c = self._color_cache[tuple(rgb)] = QColor(*rgb)
+        return c
+
+    def draw_dots(self, pt, passed_mins, is_today, notes):
+        # 批量绘制：圆点按分钟有序，过去 / 当前 / 未来只是有序数组上的三段区间，
+        # 用二分找到分界后，每一类用一次 drawPoints (圆头画笔) 画完
+        rad = self.config['dot_radius']
+        inv = self.config['interval']
+        dot_idx, points = self.get_dot_points()
+        n = len(dot_idx)
+        if is_today:
+            # idx + inv <= passed 为过去，idx < passed < idx + inv 为当前
+            k_past = bisect_right(dot_idx, passed_mins - inv)
+            k_now = bisect_left(dot_idx, passed_mins)
+        elif self.current_view_date < QDate.currentDate():
+            k_past = k_now = n
+        else:
+            k_past = k_now = 0
+        classes = [(0, k_past, self.config['inactive_color']),
+                   (k_past, k_now, self.config['current_color']),
+                   (k_now, n, self.config['active_color'])]
+        
+        h = bisect_left(dot_idx, self.hovered_dot_idx) if self.hovered_dot_idx != -1 else -1
+        if not (0 <= h < n and dot_idx[h] == self.hovered_dot_idx): h = -1
+        pen = QPen()
+        pen.setCapStyle(Qt.PenCapStyle.RoundCap)
+        pen.setWidthF(rad * 2)
+        pt.setBrush(Qt.BrushStyle.NoBrush)
+        hover_col = None
+        for lo, hi, col in classes:
+            if lo >= hi: continue
+            pen.setColor(col)
+            pt.setPen(pen)
+            # 悬停的圆点从所在区间中挖掉，单独放大绘制
+            if lo <= h < hi:
+                hover_col = col
+                if h > lo: pt.drawPoints(points.mid(lo, h - lo))
+                if hi > h + 1: pt.drawPoints(points.mid(h + 1, hi - h - 1))
+            else:
+                pt.drawPoints(points.mid(lo, hi - lo))
+        if hover_col is not None:
+            pen.setColor(hover_col.lighter(150))
+            pen.setWidthF(rad * 2 * 1.3)
+            pt.setPen(pen)
+            pt.drawPoint(points[h])
+        
+        # 笔记小圆点：按颜色分组，每种颜色一次 drawPoints
+        if not notes: return
+        scale = self.config.get('note_dot_scale', 0.4)
+        base = self.grid_base()
+        groups = {}
+        for k, note in notes.items():
+            m = int(k) - base
+            i = bisect_left(dot_idx, m)
+            if i < n and dot_idx[i] == m:
+                groups.setdefault((tuple(note['color']), i == h), []).append(points[i])
+        for (rgb, hovered), pts in groups.items():
+            pen.setColor(self.note_color(rgb))
+            pen.setWidthF(rad * 2 * scale * (1.3 if hovered else 1.0))
+            pt.setPen(pen)
+            pt.drawPoints(QPolygonF(pts))
+
+    def segment_spans(self, start_idx, end_idx, layer):
+        # 时间块在每一行上的可见线段 (d_s, d_e, x1, x2, y)，绘制与脏区域计算共用
         rad, sp, sw = self.get_render_params()
         rd = self.config['row_duration']
         inv = self.config['interval']
-        thickness = 2.5 
-        if is_hovered or is_preview: thickness = 4.0
         
         offset_a = self.config.get('seg_base_offset', 6)
         step_b = self.config.get('seg_layer_step', 12)
@@ -1875,8 +3917,10 @@ class TimeDotsWidget(QWidget):
 
         s_row = start_idx // rd
         e_row = end_idx // rd
+        rows = self.get_grid_info()[0]
         
-        for r in range(s_row, e_row + 1):
+        # 只绘制落在当前网格内的部分 (开始时间调整后，历史时间块可能超出网格)
+        for r in range(max(0, s_row), min(rows - 1, e_row) + 1):
             row_s = r * rd; row_e = (r+1) * rd
             d_s = max(start_idx, row_s); d_e = min(end_idx, row_e)
             if d_s >= d_e: continue 
@@ -1899,7 +3943,13 @@ class TimeDotsWidget(QWidget):
 
             # y坐标
             y = p1.y() + y_offset_from_center
-            
+            yield d_s, d_e, x1, x2, y
+
+    def draw_segment(self, pt, start_idx, end_idx, color, layer, passed_mins, is_today, is_hovered=False, is_preview=False):
+        thickness = 2.5 
+        if is_hovered or is_preview: thickness = 4.0
+        
+        for d_s, d_e, x1, x2, y in self.segment_spans(start_idx, end_idx, layer):
             # 绘制逻辑 (保持不变)
             pt.save()
             if is_hovered or is_preview:
@@ -2055,7 +4105,188 @@ class TimeDotsWidget(QWidget):
         pt.drawPath(path)
         pt.restore()
 
+    # --- 概览视图 (周 / 月 / 年) ---
+    def get_overview_grid(self):
+        bg = self.current_content_rect
+        top_m, _ = self.get_vertical_margins(self._hover_val, self._header_val)
+        key = (self.view_mode, self.current_view_date.toJulianDay(), bg.left(), bg.top(), bg.width(), top_m)
+        if key != self._overview_key or self._overview_grid is None:
+            gw, _ = OverviewGrid(self.view_mode, self.current_view_date).size()
+            self._overview_grid = OverviewGrid(self.view_mode, self.current_view_date,
+                                               bg.left() + (bg.width() - gw) / 2, bg.top() + top_m)
+            self._overview_key = key
+        return self._overview_grid
+
+    def get_overview_date_at(self, pos):
+        if self.view_mode == 'day' or not self.current_content_rect.contains(pos): return None
+        return self.get_overview_grid().date_at(pos.x(), pos.y())
+
+    def overview_footer_rect(self):
+        bg = QRectF(self.current_content_rect)
+        return QRectF(bg.left(), bg.bottom() - BASE_MARGIN - CALENDAR_HEIGHT, bg.width(), CALENDAR_HEIGHT)
+
+    def overview_window(self):
+        # 概览中 "计划时间" 即设置里的每日起止区间 (绝对分钟)
+        _, _, s_off, e_off = self.get_grid_info()
+        base = self.grid_base()
+        return base + s_off, base + e_off
+
+    def day_summary(self, d):
+        return self.summaries.get(self.data_store, d.toString(Qt.DateFormat.ISODate))
+
+    @staticmethod
+    def covered_minutes(summary, lo, hi):
+        return sum(max(0, min(b, hi) - max(a, lo)) for a, b in summary.spans)
+
+    def draw_overview(self, pt):
+        # 网格整体缓存为一张位图 (同静态层)，每帧只贴图，再叠加悬停描边与 "今天" 的当前时间线
+        pt.drawPixmap(self.current_content_rect.topLeft(), self.get_overview_layer())
+        g = self.get_overview_grid()
+        today = QDate.currentDate()
+        radius = 2 if g.mode == 'year' else 6
+        if g.mode == 'week' and g.first <= today <= g.last:
+            lo, hi = self.overview_window()
+            now = datetime.now()
+            rect = g.rect(today)
+            y = rect.top() + min(1.0, max(0.0, (now.hour * 60 + now.minute - lo) / max(1, hi - lo))) * rect.height()
+            pt.setPen(QPen(self.config['calendar_today_color'], 1.5))
+            pt.drawLine(QPointF(rect.left(), y), QPointF(rect.right(), y))
+        if self.hovered_cell is not None:
+            pt.setPen(QPen(QColor(255, 255, 255), 2))
+            pt.setBrush(Qt.BrushStyle.NoBrush)
+            pt.drawRoundedRect(g.rect(self.hovered_cell).adjusted(-1, -1, 1, 1), radius + 1, radius + 1)
+
+    def get_overview_layer(self):
+        bg = self.current_content_rect
+        dpr = self.devicePixelRatioF()
+        key = (self.config_version, self.view_mode, self.current_view_date.toJulianDay(),
+               QDate.currentDate().toJulianDay(), self.summaries.version,
+               round(self._header_val * 64), bg.width(), bg.height(), dpr)
+        if key == self._overview_layer_key and self._overview_layer is not None:
+            return self._overview_layer
+        px = QPixmap(max(1, math.ceil(bg.width() * dpr)), max(1, math.ceil(bg.height() * dpr)))
+        px.setDevicePixelRatio(dpr)
+        px.fill(Qt.GlobalColor.transparent)
+        pt = QPainter(px)
+        pt.setRenderHint(QPainter.RenderHint.Antialiasing)
+        pt.translate(-bg.left(), -bg.top())
+        self.draw_overview_layer(pt)
+        pt.end()
+        self._overview_layer = px
+        self._overview_layer_key = key
+        return px
+
+    def draw_overview_layer(self, pt):
+        bg_rect = QRectF(self.current_content_rect)
+        pt.setBrush(QBrush(self.config['bg_color']))
+        pt.setPen(Qt.PenStyle.NoPen)
+        pt.drawRoundedRect(bg_rect, 16, 16)
+
+        g = self.get_overview_grid()
+        lo, hi = self.overview_window()
+        span = max(1, hi - lo)
+        today = QDate.currentDate()
+        days_zh = ["一", "二", "三", "四", "五", "六", "日"]
+
+        # 标签：年视图标月份，周 / 月视图标星期 (周末用红色)
+        f = pt.font()
+        f.setPixelSize(self.config.get('calendar_font_size', 8) + 1)
+        pt.setFont(f)
+        label_y = g.top - OVERVIEW_LABEL_H
+        if g.mode == 'year':
+            pt.setPen(QColor(180, 180, 180))
+            for m in range(1, 13):
+                x = g.rect(QDate(g.first.year(), m, 1)).left()
+                pt.drawText(QRectF(x, label_y, 40, OVERVIEW_LABEL_H), Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, f"{m}月")
+        else:
+            for c in range(7):
+                x = g.left + c * (g.cw + g.gap)
+                text = days_zh[c] if g.mode == 'month' else f"{days_zh[c]} {g.first.addDays(c).day()}"
+                pt.setPen(QColor(255, 100, 100) if c >= 5 else QColor(180, 180, 180))
+                pt.drawText(QRectF(x - 6, label_y, g.cw + 12, OVERVIEW_LABEL_H), Qt.AlignmentFlag.AlignCenter, text)
+
+        empty = QColor(255, 255, 255, 22)
+        radius = 2 if g.mode == 'year' else 6
+        for d in g.days():
+            rect = g.rect(d)
+            sm = self.day_summary(d)
+            future = d > today
+            col = QColor(*sm.color) if sm.color else None
+            pt.setPen(Qt.PenStyle.NoPen)
+            if g.mode == 'week':
+                # 每天一根竖条：按起止区间画出被时间块覆盖的部分，未来的日期 (计划) 颜色更淡
+                pt.setBrush(empty)
+                pt.drawRoundedRect(rect, radius, radius)
+                if col is not None:
+                    col.setAlpha(110 if future else 220)
+                    pt.setBrush(col)
+                    for a, b in sm.spans:
+                        a, b = max(a, lo), min(b, hi)
+                        if a >= b: continue
+                        pt.drawRect(QRectF(rect.left() + 3, rect.top() + (a - lo) / span * rect.height(),
+                                           rect.width() - 6, max(1.0, (b - a) / span * rect.height())))
+                if sm.notes:
+                    pt.setBrush(QColor(255, 80, 80))
+                    pt.drawEllipse(QPointF(rect.center().x(), rect.bottom() - 5), 2.5, 2.5)
+            else:
+                # 热力格：颜色取当天主色，透明度随覆盖比例增加；未来的日期只描边
+                if col is None:
+                    pt.setBrush(empty)
+                else:
+                    frac = min(1.0, self.covered_minutes(sm, lo, hi) / span)
+                    col.setAlpha(int((70 + 185 * frac) * (0.45 if future else 1.0)))
+                    pt.setBrush(col)
+                    if future: pt.setPen(QPen(QColor(*sm.color), 1))
+                pt.drawRoundedRect(rect, radius, radius)
+                if g.mode == 'month':
+                    pt.setPen(QColor(255, 255, 255, 200) if not future else QColor(200, 200, 200, 150))
+                    pt.drawText(rect, Qt.AlignmentFlag.AlignCenter, str(d.day()))
+                    if sm.notes:
+                        pt.setPen(Qt.PenStyle.NoPen)
+                        pt.setBrush(QColor(255, 80, 80))
+                        pt.drawEllipse(QPointF(rect.right() - 5, rect.top() + 5), 2, 2)
+            # 今天 / 正在查看 的描边 (悬停描边每帧单独画)
+            ring = None
+            if d == today: ring = QPen(self.config['calendar_today_color'], 1.5)
+            elif d == self.current_view_date: ring = QPen(QColor(255, 255, 255, 120), 1)
+            if ring is not None:
+                pt.setPen(ring)
+                pt.setBrush(Qt.BrushStyle.NoBrush)
+                pt.drawRoundedRect(rect.adjusted(-1, -1, 1, 1), radius + 1, radius + 1)
+
+    def draw_overview_footer(self, pt):
+        # 底部信息栏 (对应日视图的日历条)：周期合计与悬停日期的详情
+        g = self.get_overview_grid()
+        lo, hi = self.overview_window()
+        alpha = int(255 * self._hover_val)
+        def fmt(m): return f"{m // 60}h{m % 60:02d}m" if m >= 60 else f"{m}m"
+        if g.mode == 'week': title = f"{g.first.year()}年 第{g.first.weekNumber()[0]}周"
+        elif g.mode == 'month': title = f"{g.first.year()}年{g.first.month()}月"
+        else: title = f"{g.first.year()}年"
+        key = (self.view_mode, g.first.toJulianDay(), lo, hi, self.summaries.version)
+        if key != self._overview_totals_key:
+            total, active = 0, 0
+            for d in g.days():
+                m = self.covered_minutes(self.day_summary(d), lo, hi)
+                total += m
+                active += m > 0
+            self._overview_totals = (total, active)
+            self._overview_totals_key = key
+        total, active = self._overview_totals
+        lines = [f"{title} · {fmt(total)} · {active} 天"]
+        if self.hovered_cell is not None:
+            d = self.hovered_cell
+            sm = self.day_summary(d)
+            days_zh = ["一", "二", "三", "四", "五", "六", "日"]
+            lines.append(f"{d.month()}/{d.day()} 周{days_zh[d.dayOfWeek() - 1]} · {fmt(self.covered_minutes(sm, lo, hi))} · {sm.segments} 段 · {sm.notes} 备注")
+        f = pt.font()
+        f.setPixelSize(self.config.get('calendar_font_size', 8) + 1)
+        pt.setFont(f)
+        pt.setPen(QColor(200, 200, 200, alpha))
+        pt.drawText(self.overview_footer_rect(), Qt.AlignmentFlag.AlignCenter, "\n".join(lines))
+
     def mousePressEvent(self, e: QMouseEvent):
+        self.flush_pointer()
         self.close_current_popup() 
         
         # --- [修复] 锁定状态处理 ---
@@ -2088,8 +4319,7 @@ class TimeDotsWidget(QWidget):
             def on_interval_selected(val):
                 self.config['interval'] = val
                 self.save_config()
-                self.force_refresh_max_geometry() 
-                self.update()
+                self.apply_config_change()
             
             g_pos = self.mapToGlobal(e.pos())
             rd = self.config['row_duration']
@@ -2111,6 +4341,17 @@ class TimeDotsWidget(QWidget):
                 self.update()
                 return
         
+        # 概览：左键点击某一天回到该日的点阵视图
+        if self.view_mode != 'day':
+            if e.button() == Qt.MouseButton.LeftButton and (d := self.get_overview_date_at(pos)) is not None:
+                self.set_view_mode('day', d)
+                return
+            if e.button() == Qt.MouseButton.LeftButton:
+                self.state = InteractionState.DraggingWindow
+                self.drag_start_global = e.globalPosition().toPoint()
+                self.window_start_pos = self.pos()
+            return
+
         date_at_pos = self.get_date_at_pos(pos)
         if date_at_pos:
             diff = self.current_view_date.daysTo(date_at_pos)
@@ -2135,9 +4376,9 @@ class TimeDotsWidget(QWidget):
                 self.active_segment_idx = idx
                 self.temp_end_idx = idx
                 inv = self.config['interval']
-                self.preview_segment = {
-                    'start': idx, 'end': idx + inv, 'color': [255, 255, 255], 'layer': 0
-                }
+                self.set_preview_segment({
+                    'start': self.grid_base() + idx, 'end': self.grid_base() + idx + inv, 'color': [255, 255, 255], 'layer': 0
+                })
                 self.force_refresh_max_geometry() 
                 self.update()
                 return
@@ -2150,10 +4391,14 @@ class TimeDotsWidget(QWidget):
             delta = e.angleDelta().y()
             if delta != 0:
                 steps = -1 if delta > 0 else 1
-                self.scroll_date(steps)
+                # Ctrl + 滚轮在 日 / 周 / 月 / 年 之间缩放；概览中普通滚轮按周期翻页
+                if e.modifiers() & Qt.KeyboardModifier.ControlModifier: self.zoom_view(steps)
+                elif self.view_mode != 'day': self.scroll_period(steps)
+                else: self.scroll_date(steps)
 
     def mouseMoveEvent(self, e: QMouseEvent):
         pos = e.pos()
+        self.kick_animation()
         
         # --- [修复] 锁定状态下的严格交互控制 ---
         if self.is_locked:
@@ -2164,7 +4409,7 @@ class TimeDotsWidget(QWidget):
 
             # 如果控件已浮现 (Locked-Hover)，只检测红绿灯
             r, y, g = self.get_traffic_lights_rects()
-            old_light = self.hovered_light_idx
+            old_hover = self.hover_state()
             
             if r.contains(QPointF(pos)): self.hovered_light_idx = 0
             elif y.contains(QPointF(pos)): self.hovered_light_idx = 1
@@ -2179,11 +4424,11 @@ class TimeDotsWidget(QWidget):
             self.hovered_segment = None
             self.hovered_date = None
             self.hovered_arrow = None
+            self.hovered_cell = None
             # 右上角设置区也不允许在锁定下交互，所以这里不做检测
 
-            # 仅在红绿灯状态改变时重绘
-            if old_light != self.hovered_light_idx:
-                self.update()
+            # 仅重绘状态改变的元素
+            self.invalidate_hover(old_hover)
             
             # 手型光标仅在红绿灯上显示
             if self.hovered_light_idx != -1:
@@ -2195,43 +4440,62 @@ class TimeDotsWidget(QWidget):
         # --- [修复结束] ---
 
         # --- 以下为非锁定状态 (Normal) 的常规逻辑 ---
+        # 高回报率鼠标每秒会送来上百个事件：只记录最新位置，命中测试与几何调整每帧最多一次。
+        # 距上次处理已超过一帧时立即处理 (不增加延迟)，否则合并到下一帧
+        self._pending_move = (pos, e.globalPosition().toPoint())
+        if self.move_timer.isActive(): return
+        wait = FRAME_MS - (monotonic() - self._last_move_t) * 1000
+        if wait <= 0: self.flush_pointer()
+        else: self.move_timer.start(max(1, int(wait)))
+
+    def flush_pointer(self):
+        # 按下 / 松开前也要先处理积压的移动，保证拖拽预览停在最后的位置
+        self.move_timer.stop()
+        if self._pending_move is None: return
+        pos, global_pos = self._pending_move
+        self._pending_move = None
+        self._last_move_t = monotonic()
+        self.process_pointer(pos, global_pos)
+
+    def process_pointer(self, pos, global_pos):
+        if self.state == InteractionState.DraggingWindow:
+            diff = global_pos - self.drag_start_global
+            self.move(self.window_start_pos + diff)
+            return
+
+        old_hover = self.hover_state()
         
         # [新增] 右上角交互区 Hover 检测
-        if hasattr(self, 'interval_info_rect') and self.interval_info_rect.contains(QPointF(pos)):
+        self.hovered_info = hasattr(self, 'interval_info_rect') and self.interval_info_rect.contains(QPointF(pos))
+        if self.hovered_info:
             self.setCursor(Qt.CursorShape.PointingHandCursor)
-            self.update() 
         
-        old_dot = self.hovered_dot_idx
         self.hovered_dot_idx = self.get_idx_at_pos(pos)
-        
-        old_seg = self.hovered_segment
         self.hovered_segment = self.get_segment_at_pos(pos)
         
         r, y, g = self.get_traffic_lights_rects()
-        old_light = self.hovered_light_idx
         if r.contains(QPointF(pos)): self.hovered_light_idx = 0
         elif y.contains(QPointF(pos)): self.hovered_light_idx = 1
         elif g.contains(QPointF(pos)): self.hovered_light_idx = 2
         else: self.hovered_light_idx = -1
         
-        old_date = self.hovered_date
         self.hovered_date = self.get_date_at_pos(pos)
+        self.hovered_cell = self.get_overview_date_at(pos)
         
-        old_arrow = self.hovered_arrow
         self.hovered_arrow = None
         for key, rect in self.arrow_rects.items():
             if rect.contains(QPointF(pos)):
                 self.hovered_arrow = key
                 break
 
-        if old_light != self.hovered_light_idx or old_date != self.hovered_date or old_arrow != self.hovered_arrow:
-            self.update()
+        # 只重绘 hover 状态改变的元素
+        self.invalidate_hover(old_hover)
             
         current_obj = None
         if self.hovered_segment: current_obj = ('seg', self.hovered_segment)
         elif self.hovered_dot_idx != -1:
             data = self.get_current_data()
-            if str(self.hovered_dot_idx) in data['notes']:
+            if self.note_key(self.hovered_dot_idx) in data['notes']:
                 current_obj = ('note', self.hovered_dot_idx)
         
         if current_obj != self.last_hovered_obj:
@@ -2242,11 +4506,8 @@ class TimeDotsWidget(QWidget):
                 self.active_tooltip = None
             if current_obj: self.tooltip_timer.start(500) 
         
-        if old_dot != self.hovered_dot_idx or old_seg != self.hovered_segment: 
-            self.update()
-
         if self.state == InteractionState.CreatingSegment:
-             idx = self.get_idx_at_pos(pos)
+             idx = self.hovered_dot_idx
              if idx != -1:
                  self.temp_end_idx = idx
                  s, e_idx = min(self.active_segment_idx, self.temp_end_idx), max(self.active_segment_idx, self.temp_end_idx)
@@ -2255,8 +4516,9 @@ class TimeDotsWidget(QWidget):
                  else: s = idx; e_idx = self.active_segment_idx + inv
                  
                  if self.preview_segment:
-                     self.preview_segment['start'] = s
-                     self.preview_segment['end'] = e_idx
+                     new_span = (self.grid_base() + s, self.grid_base() + e_idx)
+                     if new_span != (self.preview_segment['start'], self.preview_segment['end']):
+                         self.set_preview_span(*new_span)
                  
                  self.update_grid_cache() 
                  req_w, req_h = self.calculate_ideal_dim(1.0, 1.0)
@@ -2273,15 +4535,10 @@ class TimeDotsWidget(QWidget):
                  hrs = diff.seconds // 3600
                  mins = (diff.seconds % 3600) // 60
                  dur_str = f"{hrs}h {mins}m" if hrs > 0 else f"{mins}m"
-                 QToolTip.showText(e.globalPosition().toPoint(), f"{t1.strftime('%H:%M')} - {t2.strftime('%H:%M')} ({dur_str})", self)
+                 QToolTip.showText(global_pos, f"{t1.strftime('%H:%M')} - {t2.strftime('%H:%M')} ({dur_str})", self)
              return
 
-        if self.state == InteractionState.DraggingWindow:
-            diff = e.globalPosition().toPoint() - self.drag_start_global
-            self.move(self.window_start_pos + diff)
-            return
-
-        if self.hovered_dot_idx != -1 or self.hovered_segment is not None or self.hovered_light_idx != -1 or self.hovered_date is not None or self.hovered_arrow is not None: 
+        if self.hovered_dot_idx != -1 or self.hovered_segment is not None or self.hovered_light_idx != -1 or self.hovered_date is not None or self.hovered_arrow is not None or self.hovered_cell is not None: 
             self.setCursor(Qt.CursorShape.PointingHandCursor)
         elif hasattr(self, 'interval_info_rect') and self.interval_info_rect.contains(QPointF(pos)):
             self.setCursor(Qt.CursorShape.PointingHandCursor)
@@ -2295,7 +4552,7 @@ class TimeDotsWidget(QWidget):
         if typ == 'seg': text = val.get('text', "")
         elif typ == 'note':
             data = self.get_current_data()
-            text = data['notes'][str(val)].get('text', "")
+            text = data['notes'][self.note_key(val)].get('text', "")
         if text:
             self.active_tooltip = OverlayTooltip(text, self)
             g_pos = QCursor.pos()
@@ -2304,6 +4561,7 @@ class TimeDotsWidget(QWidget):
 
     def mouseReleaseEvent(self, e: QMouseEvent):
         if self.is_locked: return
+        self.flush_pointer()
         
         if self.state == InteractionState.DraggingWindow:
             self.force_refresh_max_geometry()
@@ -2320,20 +4578,24 @@ class TimeDotsWidget(QWidget):
                     self.update()
             def confirm(col, txt):
                 if self.preview_segment:
-                    data = self.get_current_data()
-                    data['segments'].append({
+                    data = self.get_current_data_for_write()
+                    seg = {
                         'start': self.preview_segment['start'], 
                         'end': self.preview_segment['end'],
                         'color': [col.red(), col.green(), col.blue()],
                         'layer': 0,
                         'text': txt 
-                    })
-                    self.preview_segment = None
+                    }
+                    data['segments'].append(seg)
+                    self.journal.record('seg_add', date=self.current_view_key(), seg=seg)
+                    self.set_preview_segment(None)
+                    self.segments_changed(added=[seg])
+                    self.sync_alarms(self.current_view_key(), segs_added=[seg])
                     self.force_refresh_max_geometry() 
-                    self.save_config()
+                    self.save_day()
                     self.update()
             def cancel_create():
-                self.preview_segment = None
+                self.set_preview_segment(None)
                 self.update()
             self.close_current_popup()
             pop = EditPopup(self, default_color=QColor(255, 255, 255), 
@@ -2354,39 +4616,111 @@ class TimeDotsWidget(QWidget):
             self.del_seg(seg)
 
     def save_note(self, idx, color, text):
-        data = self.get_current_data()
-        data['notes'][str(idx)] = {
+        data = self.get_current_data_for_write()
+        k = self.note_key(idx)
+        new = {
             'color': [color.red(), color.green(), color.blue()],
             'text': text
         }
-        self.save_config()
+        self.journal.record('note', date=self.current_view_key(), key=k, old=data['notes'].get(k), new=new)
+        if k not in data['notes']: self.sync_alarms(self.current_view_key(), notes_added=[k])
+        data['notes'][k] = new
+        self.save_day()
         self.update()
 
     def del_note(self, idx):
         data = self.get_current_data()
-        if str(idx) in data['notes']:
-            del data['notes'][str(idx)]
-            self.save_config()
+        if self.note_key(idx) in data['notes']:
+            data = self.get_current_data_for_write()
+            k = self.note_key(idx)
+            self.journal.record('note', date=self.current_view_key(), key=k, old=data['notes'][k], new=None)
+            del data['notes'][k]
+            self.sync_alarms(self.current_view_key(), notes_removed=[k])
+            self.save_day()
             self.update()
 
     def del_seg(self, seg):
         data = self.get_current_data()
         if seg in data['segments']:
-            data['segments'].remove(seg)
+            data = self.get_current_data_for_write()
+            i = remove_segment(data['segments'], seg)
+            self.segments_changed(removed=[seg])
+            self.sync_alarms(self.current_view_key(), segs_removed=[seg])
+            self.journal.record('seg_del', date=self.current_view_key(), seg=seg, index=i)
             self.force_refresh_max_geometry() 
-            self.save_config()
+            self.save_day()
             self.update()
 
+    def undo(self):
+        op = self.journal.pop_undo()
+        if op: self.apply_journal_op(op, undo=True)
+
+    def redo(self):
+        op = self.journal.pop_redo()
+        if op: self.apply_journal_op(op, undo=False)
+
+    def apply_journal_op(self, op, undo):
+        key = op['date']
+        day = self.data_store.setdefault(key, {"segments": [], "notes": {}})
+        kind = op['kind']
+        layout_changed = kind in ('seg_add', 'seg_del')
+        if kind == 'seg_add' or kind == 'seg_del':
+            # seg_add 的撤销 == seg_del 的重做：删除；反之插回原位置
+            if (kind == 'seg_add') == undo:
+                remove_segment(day['segments'], op['seg'])
+                changed = {'removed': [op['seg']]}
+                self.sync_alarms(key, segs_removed=[op['seg']])
+            else:
+                day['segments'].insert(op.get('index', len(day['segments'])), op['seg'])
+                changed = {'added': [op['seg']]}
+                self.sync_alarms(key, segs_added=[op['seg']])
+        elif kind == 'seg_edit':
+            op['seg'].update(copy.deepcopy(op['old'] if undo else op['new']))
+        elif kind == 'note':
+            val = op['old'] if undo else op['new']
+            had = op['key'] in day['notes']
+            if val is None: day['notes'].pop(op['key'], None)
+            else: day['notes'][op['key']] = val
+            if had != (val is not None):
+                self.sync_alarms(key, notes_added=[op['key']] if val is not None else (), notes_removed=[op['key']] if had else ())
+        # 只刷新受影响的那一天：不是当前视图的日期只需保存，不做任何布局计算
+        if key == self.current_view_key() and layout_changed:
+            self.segments_changed(**changed)
+            self.force_refresh_max_geometry()
+        self.save_day(key)
+        self.update()
+
+    def keyPressEvent(self, e):
+        mods = e.modifiers()
+        if mods & Qt.KeyboardModifier.ControlModifier:
+            shift = bool(mods & Qt.KeyboardModifier.ShiftModifier)
+            if e.key() == Qt.Key.Key_Z:
+                self.redo() if shift else self.undo()
+                return
+            if e.key() == Qt.Key.Key_Y:
+                self.redo()
+                return
+        super().keyPressEvent(e)
+
     def open_settings(self):
         d = SettingsDialog(self)
         d.show()
     
     def toggle_lock(self):
         self.is_locked = not self.is_locked
-        self.act_lock.setChecked(self.is_locked)
+        if self.tray is not None: self.act_lock.setChecked(self.is_locked)
+        self.controls_visible = False
+        if self.is_locked:
+            self.set_click_through(True)
+        else:
+            self.lock_probe.stop()
+            self.set_click_through(False)
+        self.update_mask()
+        self.kick_animation()
         self.update()
 
 if __name__ == '__main__':
+    if run_cli(sys.argv[1:]): sys.exit(0)
     app = QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(False)
     w = TimeDotsWidget()